@@ -0,0 +1,37 @@
+"""
+_mask.py
+
+Mask-Helfer für trend_map.py: Werte + Mask fensterweise lesen und
+nicht-echte Pixel auf NaN setzen. Eigenes Modul, damit die Funktionen
+ohne den CLI-Teil von trend_map.py importierbar (und testbar) sind.
+"""
+
+import math
+import numpy as np
+
+
+def mask_threshold(dtype, threshold):
+    """
+    Schwelle im nativen Datentyp der Mask. Für Ganzzahlen gilt
+    m >= 0.8  ⇔  m >= ceil(0.8). Zusammen mit dem Test ~(m >= thr) in
+    load_block (NaN-Mask → nicht echt) ergibt das dieselben Pixel wie
+    der frühere Float-Vergleich mask >= threshold.
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind == "f":
+        return dtype.type(threshold)
+    return math.ceil(threshold)
+
+
+def load_block(srcs, win, out, mask_buf, mask_thr):
+    """
+    Liest für alle Jahre nur das Fenster `win` (Band 1 = Werte,
+    Band 2 = Mask) direkt in out[i] (T, h, w) und setzt nicht-echte
+    Pixel auf NaN. mask_buf: wiederverwendeter (h, w)-Puffer im
+    nativen Mask-Datentyp (kein float32-Cast nur für den Vergleich).
+    """
+    for i, src in enumerate(srcs):
+        src.read(1, window=win, out=out[i])
+        src.read(2, window=win, out=mask_buf)
+        # ~(m >= thr) statt m < thr: NaN in der Mask gilt als nicht echt
+        np.copyto(out[i], np.nan, where=~(mask_buf >= mask_thr))
@@ -2,10 +2,13 @@
 # -*- coding: utf-8 -*-
 
 import argparse
-import json
+import base64
+import gzip
+import orjson
 import numpy as np
-import pandas as pd
 from pathlib import Path
+import pyarrow as pa
+import pyarrow.csv as pac
 import xgboost as xgb
 from sklearn.tree import DecisionTreeRegressor
 
@@ -15,27 +18,59 @@ from sklearn.tree import DecisionTreeRegressor
 # 1) Surrogate Tree trainieren
 # ---------------------------------------------------------
 
+def count_csv_rows(path, chunk_size=1 << 20):
+    """
+    Obergrenze für die Anzahl Datenzeilen (ohne Header), über die
+    Zeilenumbrüche gezählt – reicht zum Vorallozieren der Arrays.
+    """
+    n = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            n += chunk.count(b"\n")
+            last = chunk[-1:]
+    if last != b"\n":
+        n += 1
+    return max(n - 1, 0)
+
+
 def train_surrogate(model_path, data_path, max_depth=4):
     print("→ Lade XGBoost-Modell…")
-    model = xgb.XGBClassifier()
-    model.load_model(model_path)
+    # nur der Booster wird gebraucht – kein sklearn-Wrapper
+    booster = xgb.Booster()
+    booster.load_model(model_path)
 
-    booster = model.get_booster()
     feature_names = booster.feature_names
     print(f"→ Modell hat {len(feature_names)} Features")
 
-    print("→ Lade Daten…")
-    df = pd.read_csv(data_path)
-
-    X = df[feature_names].copy()
-
-    # numerische Typen erzwingen
-    for col in X.columns:
-        if X[col].dtype == "object":
-            X[col] = X[col].astype(float)
+    print("→ Lade Daten & berechne Modell-Predictions (batchweise)…")
+    # nur die Modell-Features lesen und direkt als float32 parsen
+    convert = pac.ConvertOptions(
+        include_columns=feature_names,
+        column_types={f: pa.float32() for f in feature_names},
+    )
 
-    print("→ Berechne Modell-Predictions…")
-    y_pred = model.predict_proba(X)[:, 1]
+    n_max = count_csv_rows(data_path)
+    X = np.empty((n_max, len(feature_names)), dtype=np.float32)
+    y_pred = np.empty(n_max, dtype=np.float32)
+
+    # immer nur ein CSV-Batch im Speicher, Ergebnis direkt in X / y_pred
+    n = 0
+    for batch in pac.open_csv(data_path, convert_options=convert):
+        stop = n + batch.num_rows
+        # Arrow-Spalten (schon float32) direkt in X, ohne DataFrame dazwischen
+        for j, col in enumerate(batch.columns):
+            X[n:stop, j] = col.to_numpy(zero_copy_only=False)
+        # zusammenhängender float32-Block → kein DMatrix-Aufbau, liefert direkt P(1)
+        pred = booster.inplace_predict(X[n:stop])
+        # multi:softprob liefert (n, K) – entspricht predict_proba[:, 1]
+        y_pred[n:stop] = pred[:, 1] if pred.ndim == 2 else pred
+        n = stop
+
+    # X bleibt float32 + C-contiguous (Zeilen-Slice ist ein View): genau das Format,
+    # das der sklearn-Tree-Builder intern nutzt → fit() legt keine float64-Kopie an
+    X, y_pred = X[:n], y_pred[:n]
+    print(f"→ {n} Zeilen verarbeitet")
 
     surrogate = DecisionTreeRegressor(
         max_depth=max_depth,
@@ -56,23 +91,30 @@ def train_surrogate(model_path, data_path, max_depth=4):
 
 def tree_to_json(tree, feature_names):
 
-    def recurse(node_id):
-
-        # Leaf?
-        if tree.children_left[node_id] == -1:
-            return {"leaf": float(tree.value[node_id][0][0])}
+    # flache sklearn-Arrays einmal in Python-Listen ziehen
+    feat = tree.feature.tolist()
+    thr = tree.threshold.tolist()
+    left = tree.children_left.tolist()
+    right = tree.children_right.tolist()
+    values = tree.value[:, 0, 0].tolist()
 
-        feat = feature_names[tree.feature[node_id]]
-        thr = float(tree.threshold[node_id])
+    # Kinder haben größere IDs als ihre Eltern → rückwärts bauen, ohne Rekursion
+    nodes = [None] * tree.node_count
+    for nid in range(tree.node_count - 1, -1, -1):
 
-        return {
-            "feature": feat,
-            "threshold": thr,
-            "yes": recurse(tree.children_left[node_id]),
-            "no": recurse(tree.children_right[node_id])
+        # Leaf?
+        if left[nid] == -1:
+            nodes[nid] = {"leaf": values[nid]}
+            continue
+
+        nodes[nid] = {
+            "feature": feature_names[feat[nid]],
+            "threshold": thr[nid],
+            "yes": nodes[left[nid]],
+            "no": nodes[right[nid]]
         }
 
-    return recurse(0)
+    return nodes[0]
 
 
 
@@ -85,18 +127,18 @@ HTML_TEMPLATE = """
 <meta charset="utf-8">
 <title>Global Surrogate Tree</title>
 <style>
-body {{
+body {
   font-family: system-ui, sans-serif;
   margin: 0; padding: 1rem;
-}}
-.label {{
+}
+.label {
   font-size: 12px;
   text-anchor: middle;
-}}
-.edge-label {{
+}
+.edge-label {
   fill: #444;
   font-size: 11px;
-}}
+}
 </style>
 
 <svg id="tree-svg"></svg>
@@ -104,29 +146,38 @@ body {{
 <script src="https://d3js.org/d3.v7.min.js"></script>
 <script>
 
-const treeData = __TREE_JSON__;
+// Baum-JSON liegt gzip-komprimiert + base64 vor, Entpacken nativ im Browser
+async function inflateJson(b64) {
+  const raw = Uint8Array.from(atob(b64), c => c.charCodeAt(0));
+  const stream = new Blob([raw]).stream().pipeThrough(new DecompressionStream("gzip"));
+  return JSON.parse(await new Response(stream).text());
+}
+
+(async () => {
+
+const treeData = await inflateJson("__TREE_GZB64__");
 
 const svg = d3.select("#tree-svg");
 const dx = 220, dy = 180;
 const nodeW = 240, nodeH = 70;
 
-const root = d3.hierarchy(treeData, d => {{
+const root = d3.hierarchy(treeData, d => {
   const c = [];
-  if (d.yes) c.push(Object.assign({{_edge:"Ja"}}, d.yes));
-  if (d.no)  c.push(Object.assign({{_edge:"Nein"}}, d.no));
+  if (d.yes) c.push(Object.assign({_edge:"Ja"}, d.yes));
+  if (d.no)  c.push(Object.assign({_edge:"Nein"}, d.no));
   return c.length ? c : null;
-}});
+});
 
 d3.tree().nodeSize([dx, dy])(root);
 
 // SVG Größe bestimmen
 let minX=1e9, maxX=-1e9, minY=1e9, maxY=-1e9;
-root.each(d => {{
+root.each(d => {
   if (d.x < minX) minX = d.x;
   if (d.x > maxX) maxX = d.x;
   if (d.y < minY) minY = d.y;
   if (d.y > maxY) maxY = d.y;
-}});
+});
 
 const padding = 200;
 svg.attr("width",(maxX-minX)+2*padding);
@@ -162,10 +213,10 @@ const node = g.append("g")
  .join("g")
  .attr("transform", d => `translate(${d.x},${d.y})`);
 
-node.each(function(d){{
+node.each(function(d){
   const n = d3.select(this);
 
-  if (d.data.leaf !== undefined) {{
+  if (d.data.leaf !== undefined) {
     n.append("rect")
      .attr("x",-90).attr("y",-25)
      .attr("width",180).attr("height",50)
@@ -173,7 +224,7 @@ node.each(function(d){{
     n.append("text").attr("class","label").attr("dy",4)
      .text("Leaf: "+d.data.leaf.toFixed(3));
     return;
-  }}
+  }
 
   n.append("rect")
    .attr("x",-nodeW/2).attr("y",-nodeH/2)
@@ -187,19 +238,28 @@ node.each(function(d){{
   n.append("text").attr("class","label")
    .attr("y",nodeH/2 + 14)
    .text("Threshold: "+d.data.threshold.toFixed(3));
-}});
+});
+
+})();
 
 </script>
 """
 
+# Template einmal beim Import am Platzhalter zerlegen
+_HEAD, _TAIL = HTML_TEMPLATE.split("__TREE_GZB64__", 1)
 
 
-def export_html(tree_json_path, out_html):
-    tree_text = Path(tree_json_path).read_text()
 
-    html = HTML_TEMPLATE.replace("__TREE_JSON__", tree_text)
+def export_html(tree_text, out_html):
+    """tree_text: bereits serialisierter Baum (JSON-String)."""
+    # gzip + base64: JSON schrumpft ~5–10×, der Browser entpackt selbst
+    packed = base64.b64encode(gzip.compress(tree_text.encode("utf-8"), 6)).decode("ascii")
 
-    Path(out_html).write_text(html, encoding="utf-8")
+    # Kopf, Daten, Rest direkt nacheinander schreiben → keine Kopie des ganzen HTML
+    with open(out_html, "w", encoding="utf-8") as f:
+        f.write(_HEAD)
+        f.write(packed)
+        f.write(_TAIL)
     print(f"✓ HTML gespeichert: {out_html}")
 
 
@@ -221,11 +281,15 @@ def main():
     print("→ Konvertiere Baum nach JSON…")
     tree_json = tree_to_json(surrogate.tree_, feature_names)
 
+    # einmal kompakt serialisieren (orjson → UTF-8-Bytes), für Side-Car und HTML
+    tree_bytes = orjson.dumps(tree_json)
+    tree_text = tree_bytes.decode("utf-8")
+
     json_path = Path(args.out).with_suffix(".json")
-    json_path.write_text(json.dumps(tree_json, indent=2), encoding="utf-8")
+    json_path.write_bytes(tree_bytes)
     print(f"✓ JSON gespeichert: {json_path}")
 
-    export_html(json_path, args.out)
+    export_html(tree_text, args.out)
 
     print("\n=== DONE ===")
 
@@ -3,7 +3,8 @@
 
 """
 Trainiert einen Global Surrogate Tree für ein XGBoost-Modell
-und speichert den Baum als JSON.
+und speichert den Baum als JSON:
+  {"palettes": {...}, "ranges": {...}, "tree": {...}}
 
 Aufruf z.B.:
 
@@ -15,14 +16,33 @@ python analyse/global_surrogate_train.py \
 """
 
 import argparse
-import json
+import csv
+from functools import lru_cache
 from pathlib import Path
+from types import SimpleNamespace
 
 import numpy as np
-import pandas as pd
-from sklearn.tree import DecisionTreeRegressor
+import orjson
+import pyarrow as pa
+import pyarrow.csv as pac
+from sklearn.tree import DecisionTreeRegressor, ExtraTreeRegressor
 import xgboost as xgb
 
+# gemeinsamer Helfer – Skripte laufen als "python analyse/…", analyse/ liegt im Pfad
+from global_surrogate import count_csv_rows
+
+try:
+    import lightgbm as lgb
+    HAVE_LIGHTGBM = True
+except Exception:
+    HAVE_LIGHTGBM = False
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except Exception:
+    HAVE_NUMBA = False
+
 # -------------------------------
 # Farbpaletten & Ranges
 # -------------------------------
@@ -32,41 +52,58 @@ NDWI_PALETTE = ["#f7fbff", "#6baed6", "#08519c"]
 MORAN_PALETTE = ["#fee8c8", "#fdbb84", "#e34a33"]
 GEARY_PALETTE = ["#f7f4f9", "#998ec3", "#542788"]
 
+DEFAULT_PALETTE = ["#dddddd", "#aaaaaa", "#666666"]
+
+# Paletten & Ranges werden einmal als Tabelle exportiert,
+# Split-Knoten tragen nur noch den Schlüssel ("pal")
+PALETTES = {
+    "ndvi": NDVI_PALETTE,
+    "ndwi": NDWI_PALETTE,
+    "moran": MORAN_PALETTE,
+    "geary": GEARY_PALETTE,
+    "default": DEFAULT_PALETTE,
+}
+
 RANGES = {
-    "ndvi_mean": (0.0, 1.0),
-    "ndwi_mean": (-1.0, 1.0),
+    "ndvi": (0.0, 1.0),
+    "ndwi": (-1.0, 1.0),
     "moran": (-0.2, 4.0),
     "geary": (0.0, 1.5),
+    "default": (0.0, 1.0),
 }
 
 # -------------------------------
 # Feature-Semantik
 # -------------------------------
 
+# Präfix nach "mXX_" → (Beschreibung, Index, Paletten-Schlüssel)
+SEMANTICS = {
+    "ndvi_mean": ("Vegetationsdichte", "NDVI", "ndvi"),
+    "ndwi_mean": ("Feuchtigkeit", "NDWI", "ndwi"),
+    "moran_ndvi": ("Vegetations-Cluster", "Moran", "moran"),
+    "moran_ndwi": ("Feuchtigkeits-Cluster", "Moran", "moran"),
+    "geary_ndvi": ("Vegetations-Heterogenität", "Geary", "geary"),
+    "geary_ndwi": ("Feuchtigkeits-Heterogenität", "Geary", "geary"),
+}
+
+@lru_cache(maxsize=None)
 def infer_semantics(feature_name: str):
     """
     Nimmt z.B.
       m12_ndvi_mean
       m08_geary_ndwi
       m10_moran_ndvi
-    und liefert Label, Palette, Range.
+    und liefert (label, Paletten-Schlüssel) – Schlüssel in PALETTES/RANGES.
+    Gecacht, da sich dieselben Feature-Namen über viele Knoten wiederholen.
     """
     if not (feature_name.startswith("m") and "_" in feature_name):
-        return {
-            "label": feature_name,
-            "palette": ["#dddddd", "#aaaaaa", "#666666"],
-            "range": (0.0, 1.0),
-        }
+        return feature_name, "default"
 
     try:
         month = int(feature_name[1:3])
         rest = feature_name[4:]
     except Exception:
-        return {
-            "label": feature_name,
-            "palette": ["#dddddd", "#aaaaaa", "#666666"],
-            "range": (0.0, 1.0),
-        }
+        return feature_name, "default"
 
     if month in (7, 8, 9):
         season = "Sommer"
@@ -75,51 +112,87 @@ def infer_semantics(feature_name: str):
     else:
         season = "Saison"
 
-    label = feature_name
-    palette = ["#dddddd", "#aaaaaa", "#666666"]
-    rng = (0.0, 1.0)
-
-    if rest.startswith("ndvi_mean"):
-        label = f"Vegetationsdichte ({season}, NDVI)"
-        palette = NDVI_PALETTE
-        rng = RANGES["ndvi_mean"]
-    elif rest.startswith("ndwi_mean"):
-        label = f"Feuchtigkeit ({season}, NDWI)"
-        palette = NDWI_PALETTE
-        rng = RANGES["ndwi_mean"]
-    elif rest.startswith("moran_ndvi"):
-        label = f"Vegetations-Cluster ({season}, Moran)"
-        palette = MORAN_PALETTE
-        rng = RANGES["moran"]
-    elif rest.startswith("moran_ndwi"):
-        label = f"Feuchtigkeits-Cluster ({season}, Moran)"
-        palette = MORAN_PALETTE
-        rng = RANGES["moran"]
-    elif rest.startswith("geary_ndvi"):
-        label = f"Vegetations-Heterogenität ({season}, Geary)"
-        palette = GEARY_PALETTE
-        rng = RANGES["geary"]
-    elif rest.startswith("geary_ndwi"):
-        label = f"Feuchtigkeits-Heterogenität ({season}, Geary)"
-        palette = GEARY_PALETTE
-        rng = RANGES["geary"]
-
-    return {
-        "label": label,
-        "palette": palette,
-        "range": rng,
-    }
+    entry = SEMANTICS.get("_".join(rest.split("_", 2)[:2]))
+    if entry is None:
+        return feature_name, "default"
+
+    desc, index, pal = entry
+    return f"{desc} ({season}, {index})", pal
 
 # -------------------------------
 # 1) Surrogate trainieren
 # -------------------------------
 
-def train_surrogate(model_path: str, data_path: str, max_depth: int = 4):
+def stratified_sample(y_pred, sample_cap, n_bins=10, seed=42):
+    """
+    Zeilenindizes einer nach y_pred-Quantilen geschichteten Stichprobe:
+    je Bin höchstens sample_cap // n_bins Zeilen, die Verteilung von
+    y_pred bleibt damit erhalten.
+    """
+    rng = np.random.default_rng(seed)
+    edges = np.quantile(y_pred, np.linspace(0, 1, n_bins + 1)[1:-1])
+    bins = np.digitize(y_pred, edges)
+    per_bin = sample_cap // n_bins
+
+    idx = []
+    for b in range(n_bins):
+        members = np.flatnonzero(bins == b)
+        if len(members) > per_bin:
+            members = rng.choice(members, size=per_bin, replace=False)
+        idx.append(members)
+
+    # sortiert → X[idx] liest speicherfreundlich von vorne nach hinten
+    return np.sort(np.concatenate(idx))
+
+def quantile_cuts(X, max_bin=256):
+    """
+    Quantil-Schnittpunkte je Feature aus XGBoosts Histogramm-Sketch
+    (dieselben Bins wie beim Training mit tree_method="hist").
+    Rückgabe: (indptr, cuts) – Cuts von Feature j = cuts[indptr[j]:indptr[j+1]].
+    """
+    qdm = xgb.QuantileDMatrix(X, max_bin=max_bin)
+    indptr, cuts = qdm.get_quantile_cut()
+    return np.asarray(indptr, dtype=np.int64), np.asarray(cuts, dtype=np.float32)
+
+if HAVE_NUMBA:
+    @njit(parallel=True, cache=True)
+    def _bin_columns(X, indptr, cuts, out):
+        for j in prange(X.shape[1]):
+            idx = np.searchsorted(cuts[indptr[j]:indptr[j + 1]], X[:, j], "right")
+            for i in range(X.shape[0]):
+                out[i, j] = idx[i]
+
+def bin_features(X, indptr, cuts):
+    """
+    Ersetzt jeden Wert durch seinen Bin-Index (Anzahl Cuts <= x).
+    uint8, solange jedes Feature höchstens 255 Cuts hat, sonst uint16.
+    Fehlende Werte (NaN) bleiben NaN (dann float32), damit LightGBMs
+    Missing-Value-Behandlung greift – searchsorted würde sie sonst in
+    den obersten Bin sortieren, also wie das Feature-Maximum behandeln.
+    """
+    n_cuts = int(np.diff(indptr).max()) if len(indptr) > 1 else 0
+    X_bin = np.empty(X.shape, dtype=np.uint8 if n_cuts <= 255 else np.uint16)
+
+    if HAVE_NUMBA:
+        _bin_columns(X, indptr, cuts, X_bin)
+    else:
+        for j in range(X.shape[1]):
+            X_bin[:, j] = np.searchsorted(cuts[indptr[j]:indptr[j + 1]], X[:, j], side="right")
+
+    missing = np.isnan(X)
+    if missing.any():
+        X_bin = X_bin.astype(np.float32)
+        X_bin[missing] = np.nan
+    return X_bin
+
+def train_surrogate(model_path: str, data_path: str, max_depth: int = 4,
+                    backend: str = "sklearn", sample_cap: int = 50000,
+                    fast: bool = False, prebin: bool = False):
     print("→ Lade XGBoost-Modell…")
-    model = xgb.XGBClassifier()
-    model.load_model(model_path)
+    # nur der Booster wird gebraucht – kein sklearn-Wrapper
+    booster = xgb.Booster()
+    booster.load_model(model_path)
 
-    booster = model.get_booster()
     feature_names = booster.feature_names
     if feature_names is None:
         raise ValueError("❌ Modell enthält keine Feature-Namen im Booster!")
@@ -127,26 +200,89 @@ def train_surrogate(model_path: str, data_path: str, max_depth: int = 4):
     print(f"→ Modell hat {len(feature_names)} Features")
 
     print("→ Lade Daten…")
-    df = pd.read_csv(data_path)
+    with open(data_path, newline="", encoding="utf-8") as f:
+        columns = set(next(csv.reader(f)))
 
-    missing = [f for f in feature_names if f not in df.columns]
+    # Set-Lookup statt Listensuche – bei breiten Modellen sonst O(F²)
+    missing = [f for f in feature_names if f not in columns]
     if missing:
         raise ValueError(f"❌ CSV enthält nicht alle Modell-Features. Fehlend: {missing}")
 
-    X = df[feature_names].copy()
-
-    for col in X.columns:
-        if X[col].dtype == "object":
-            try:
-                X[col] = X[col].astype(float)
-            except Exception:
-                raise ValueError(f"❌ Spalte {col} ist object und lässt sich nicht in float casten.")
+    # nur die Modell-Features lesen und direkt als float32 parsen
+    convert = pac.ConvertOptions(
+        include_columns=feature_names,
+        column_types={f: pa.float32() for f in feature_names},
+    )
 
-    print("→ Berechne Modell-Predictions (P(1))…")
-    y_pred = model.predict_proba(X)[:, 1]
+    n_max = count_csv_rows(data_path)
+    X = np.empty((n_max, len(feature_names)), dtype=np.float32)
+    y_pred = np.empty(n_max, dtype=np.float32)
 
-    print("→ Trainiere Surrogate DecisionTreeRegressor…")
-    surrogate = DecisionTreeRegressor(
+    # immer nur ein CSV-Batch im Speicher, Ergebnis direkt in X / y_pred
+    print("→ Berechne Modell-Predictions (P(1)) batchweise…")
+    n = 0
+    try:
+        for batch in pac.open_csv(data_path, convert_options=convert):
+            stop = n + batch.num_rows
+            # Arrow-Spalten (schon float32) direkt in X, ohne DataFrame dazwischen
+            for j, col in enumerate(batch.columns):
+                X[n:stop, j] = col.to_numpy(zero_copy_only=False)
+            # zusammenhängender float32-Block → kein DMatrix-Aufbau, liefert direkt P(1)
+            pred = booster.inplace_predict(X[n:stop])
+            # multi:softprob liefert (n, K) – entspricht predict_proba[:, 1]
+            y_pred[n:stop] = pred[:, 1] if pred.ndim == 2 else pred
+            n = stop
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"❌ Feature-Spalten lassen sich nicht in float casten: {e}")
+
+    # X bleibt float32 + C-contiguous (Zeilen-Slice ist ein View): genau das Format,
+    # das der sklearn-Tree-Builder intern nutzt → fit() legt keine float64-Kopie an
+    X, y_pred = X[:n], y_pred[:n]
+    print(f"→ {n} Zeilen verarbeitet")
+
+    if sample_cap and n > sample_cap:
+        idx = stratified_sample(y_pred, sample_cap)
+        print(f"→ Surrogate-Fit auf Stichprobe: {len(idx)} von {n} Zeilen (geschichtet nach P(1))")
+        X, y_pred = X[idx], y_pred[idx]
+
+    if backend == "lightgbm":
+        if not HAVE_LIGHTGBM:
+            raise ImportError("❌ Backend 'lightgbm' gewählt, aber lightgbm ist nicht installiert.")
+
+        extra = {}
+        cuts = None
+        if prebin:
+            # XGBoost-Quantil-Bins wiederverwenden: LightGBM sieht nur noch
+            # kleine Integer-Indizes (1–2 Byte statt 4 pro Wert)
+            print("→ Binne Features mit XGBoost-Quantil-Cuts…")
+            cuts = quantile_cuts(X)
+            X = bin_features(X, *cuts)
+            extra["max_bin"] = int(np.diff(cuts[0]).max()) + 1
+
+        # ein einzelner Histogramm-Baum: Features werden einmal gebinnt,
+        # learning_rate=1 → Leaf-Werte sind direkt die Vorhersagen
+        print("→ Trainiere Surrogate LightGBM-Einzelbaum…")
+        surrogate = lgb.LGBMRegressor(
+            n_estimators=1,
+            learning_rate=1.0,
+            max_depth=max_depth,
+            num_leaves=2 ** max_depth,
+            min_child_samples=50,
+            random_state=42,
+            verbose=-1,
+            **extra,
+        )
+        surrogate.fit(X, y_pred)
+        # für lightgbm_tree_arrays: Bin-Schwellen → Feature-Werte
+        surrogate.quantile_cuts_ = cuts
+        return surrogate, feature_names
+
+    # ExtraTree: zufällige Split-Schwellen statt Sortieren jedes Features,
+    # gleiches tree_-Layout → tree_to_json bleibt unverändert
+    tree_cls = ExtraTreeRegressor if fast else DecisionTreeRegressor
+
+    print(f"→ Trainiere Surrogate {tree_cls.__name__}…")
+    surrogate = tree_cls(
         max_depth=max_depth,
         min_samples_leaf=50,
         random_state=42
@@ -155,49 +291,111 @@ def train_surrogate(model_path: str, data_path: str, max_depth: int = 4):
 
     return surrogate, feature_names
 
+def lightgbm_tree_arrays(surrogate):
+    """
+    Bringt den (einzigen) LightGBM-Baum in das flache Layout von
+    sklearn.tree_ (feature, threshold, children_left/right, value),
+    damit tree_to_json beide Backends gleich behandelt.
+    Knoten-IDs werden in Preorder vergeben (Kinder > Eltern).
+    Wurde auf Bin-Indizes trainiert (quantile_cuts_), werden die Schwellen
+    zurück auf Feature-Werte abgebildet: bin <= k  ⇔  x < cuts_j[k].
+    JSON und Renderer prüfen "x <= thr" → exportiert wird der nächstkleinere
+    float32-Wert vor cuts_j[k], damit Werte genau auf dem Cut wie im
+    trainierten Baum nach rechts gehen.
+    """
+    root = surrogate.booster_.dump_model()["tree_info"][0]["tree_structure"]
+
+    feature, threshold, left, right, value = [], [], [], [], []
+    stack = [(root, -1, None)]
+    while stack:
+        node, parent, side = stack.pop()
+        nid = len(feature)
+        if side is not None:
+            side[parent] = nid
+
+        left.append(-1)
+        right.append(-1)
+        if "leaf_value" in node:
+            feature.append(-2)
+            threshold.append(-2.0)
+            value.append(node["leaf_value"])
+        else:
+            # LightGBM: decision_type "<=" → links wie bei sklearn
+            feature.append(node["split_feature"])
+            threshold.append(node["threshold"])
+            value.append(node["internal_value"])
+            stack.append((node["right_child"], nid, right))
+            stack.append((node["left_child"], nid, left))
+
+    cuts = getattr(surrogate, "quantile_cuts_", None)
+    if cuts is not None:
+        indptr, values = cuts
+        for nid, j in enumerate(feature):
+            if j < 0:
+                continue
+            c = values[indptr[j]:indptr[j + 1]]
+            if len(c):
+                k = min(max(int(threshold[nid]), 0), len(c) - 1)
+                threshold[nid] = float(np.nextafter(c[k], np.float32(-np.inf)))
+
+    return SimpleNamespace(
+        node_count=len(feature),
+        feature=np.asarray(feature, dtype=np.intp),
+        threshold=np.asarray(threshold, dtype=np.float64),
+        children_left=np.asarray(left, dtype=np.intp),
+        children_right=np.asarray(right, dtype=np.intp),
+        value=np.asarray(value, dtype=np.float64).reshape(-1, 1, 1),
+    )
+
+def surrogate_tree(surrogate):
+    """Flache Baumstruktur des Surrogates, unabhängig vom Backend."""
+    if hasattr(surrogate, "tree_"):
+        return surrogate.tree_
+    return lightgbm_tree_arrays(surrogate)
+
 # -------------------------------
 # 2) Sklearn-Tree → JSON-Baum
 # -------------------------------
 
 def tree_to_json(tree, feature_names):
     """
-    Konvertiert sklearn.tree_ in rekursives JSON:
-    - Splits: {feature, threshold, yes, no, label, palette, range}
+    Konvertiert sklearn.tree_ (oder surrogate_tree(...)) in rekursives JSON:
+    - Splits: {feature, threshold, yes, no, label, pal}
     - Leafs:  {leaf, suit}
     suit = mittlere Vorhersage im Leaf (≈ P(geeignet))
-    """
 
-    def recurse(node_id: int):
+    Iterativ statt rekursiv: Kinder haben immer größere Knoten-IDs als
+    ihre Eltern, rückwärts über die IDs sind beide Kinder also schon gebaut.
+    """
+    feat = tree.feature.tolist()
+    thr = tree.threshold.tolist()
+    left = tree.children_left.tolist()
+    right = tree.children_right.tolist()
+    values = tree.value[:, 0, 0].tolist()
+
+    nodes = [None] * tree.node_count
+    for nid in range(tree.node_count - 1, -1, -1):
         # Leaf?
-        if tree.feature[node_id] == -2:
-            val = float(tree.value[node_id][0][0])
-            return {
-                "leaf": val,
-                "suit": val
+        if feat[nid] == -2:
+            nodes[nid] = {
+                "leaf": values[nid],
+                "suit": values[nid]
             }
+            continue
 
-        feat_idx = int(tree.feature[node_id])
-        feat_name = feature_names[feat_idx]
-        thr = float(tree.threshold[node_id])
+        feat_name = feature_names[feat[nid]]
+        label, pal = infer_semantics(feat_name)
 
-        semantics = infer_semantics(feat_name)
-
-        left_id = int(tree.children_left[node_id])
-        right_id = int(tree.children_right[node_id])
-
-        left = recurse(left_id)
-        right = recurse(right_id)
-
-        node = {
+        nodes[nid] = {
             "feature": feat_name,
-            "threshold": thr,
-            "yes": right,  # "Ja" = rechts (>= thr)
-            "no": left,    # "Nein" = links  (< thr)
+            "threshold": thr[nid],
+            "yes": nodes[right[nid]],  # "Ja" = rechts (>= thr)
+            "no": nodes[left[nid]],    # "Nein" = links  (< thr)
+            "label": label,
+            "pal": pal,
         }
-        node.update(semantics)
-        return node
 
-    return recurse(0)
+    return nodes[0]
 
 # -------------------------------
 # MAIN
@@ -209,13 +407,26 @@ def main():
     parser.add_argument("--data", required=True, help="CSV mit Features")
     parser.add_argument("--out-json", default="surrogate_tree.json", help="JSON-Ausgabedatei")
     parser.add_argument("--depth", type=int, default=4, help="max_depth des Surrogate Trees")
+    parser.add_argument("--backend", choices=["sklearn", "lightgbm"], default="sklearn",
+                        help="Surrogate-Implementierung (lightgbm = Histogramm-Einzelbaum)")
+    parser.add_argument("--sample", type=int, default=50000,
+                        help="max. Zeilen für den Surrogate-Fit, geschichtet nach P(1) (0 = alle)")
+    parser.add_argument("--fast-surrogate", action="store_true",
+                        help="ExtraTreeRegressor (zufällige Splits) statt DecisionTreeRegressor, nur Backend sklearn")
+    parser.add_argument("--prebin", action="store_true",
+                        help="Features vorab mit XGBoost-Quantil-Cuts binnen, nur Backend lightgbm")
     args = parser.parse_args()
 
-    surrogate, featnames = train_surrogate(args.model, args.data, args.depth)
-    tree_dict = tree_to_json(surrogate.tree_, featnames)
+    surrogate, featnames = train_surrogate(args.model, args.data, args.depth, args.backend,
+                                           sample_cap=args.sample, fast=args.fast_surrogate,
+                                           prebin=args.prebin)
+    tree_dict = tree_to_json(surrogate_tree(surrogate), featnames)
+
+    # Paletten/Ranges einmal als Tabelle, Baum unter "tree"
+    out = {"palettes": PALETTES, "ranges": RANGES, "tree": tree_dict}
 
     out_path = Path(args.out_json)
-    out_path.write_text(json.dumps(tree_dict, ensure_ascii=False, indent=2), encoding="utf-8")
+    out_path.write_bytes(orjson.dumps(out, option=orjson.OPT_INDENT_2))
     print(f"✓ Surrogate-Tree-JSON gespeichert unter: {out_path}")
 
     print("=== DONE ===")
@@ -68,6 +68,8 @@ HTML = r"""
 // Eingebettete Daten
 // --------------------------------------
 const treeData = TREE_JSON;
+const palettes = PALETTES_JSON;
+const ranges   = RANGES_JSON;
 
 
 // --------------------------------------
@@ -174,8 +176,14 @@ const defs = svg.append("defs");
 // --------------------------------------
 // Gradient / Threshold
 // --------------------------------------
+// ein <linearGradient> pro Palette, nicht pro Knoten
+const gradientIds = new Map();
+
 function gradientIdFor(palette) {
-  const id = "grad_" + Math.random().toString(36).slice(2);
+  const key = palette.join("|");
+  if (gradientIds.has(key)) return gradientIds.get(key);
+
+  const id = "grad_" + gradientIds.size;
   const gr = defs.append("linearGradient")
     .attr("id", id)
     .attr("x1","0%").attr("x2","100%")
@@ -185,12 +193,13 @@ function gradientIdFor(palette) {
       .attr("offset",(i/(palette.length-1))*100+"%")
       .attr("stop-color",c);
   });
+  gradientIds.set(key, id);
   return id;
 }
 
 function thresholdXLocal(d) {
   const label = d.label || d.feature || "";
-  const [min,max] = d.range || rangeForFeature(label);
+  const [min,max] = ranges[d.pal] || d.range || rangeForFeature(label);
   const thr = d.threshold;
   if (thr == null) return 0;
   let rel = (thr-min)/(max-min);
@@ -223,7 +232,7 @@ const nodeG = g.append("g")
 nodeG.each(function(d){
   const gsel = d3.select(this);
   const label   = d.data.label || d.data.feature;
-  const palette = paletteForFeature(label);
+  const palette = palettes[d.data.pal] || paletteForFeature(label);
   const grad    = gradientIdFor(palette);
 
   gsel.append("rect")
@@ -469,10 +478,30 @@ nodeG
 </script>
 """
 
+# Template einmal beim Import an den Platzhaltern zerlegen
+_HEAD, _REST = HTML.split("TREE_JSON", 1)
+_MID1, _REST = _REST.split("PALETTES_JSON", 1)
+_MID2, _TAIL = _REST.split("RANGES_JSON", 1)
+
+
 def export_html(tree_json_path, out_html_path):
     data = json.loads(Path(tree_json_path).read_text(encoding="utf-8"))
-    html = HTML.replace("TREE_JSON", json.dumps(data, ensure_ascii=False))
-    Path(out_html_path).write_text(html, encoding="utf-8")
+
+    # neues Format: {"palettes", "ranges", "tree"}; altes: nackter Baum
+    tree = data.get("tree", data)
+    palettes = data.get("palettes", {})
+    ranges = data.get("ranges", {})
+
+    compact = dict(ensure_ascii=False, separators=(",", ":"))
+    # Stück für Stück schreiben → kein zusammengesetzter Riesen-String im Speicher
+    with open(out_html_path, "w", encoding="utf-8") as f:
+        f.write(_HEAD)
+        f.write(json.dumps(tree, **compact))
+        f.write(_MID1)
+        f.write(json.dumps(palettes, **compact))
+        f.write(_MID2)
+        f.write(json.dumps(ranges, **compact))
+        f.write(_TAIL)
     print(f"✓ HTML exportiert nach: {out_html_path}")
 
 
@@ -8,7 +8,7 @@ Berechnet:
   • Globale QA-Maske aus allen Jahres-Suitability-Karten (2017–2024)
       → QA_mean = Mittelwert aus Band 2 über alle Jahre
       → gültig, wenn QA_mean >= qa_min (Standard: 0.5)
-  • Moran’s I (global, auf Stichprobe aus allen gültigen Trendpixeln)
+  • Moran’s I (global, über alle gültigen Trendpixel auf dem echten Gitter)
   • LISA-Karte (lokaler Moran's I)
   • Quadranten-Raster (HH/LL/LH/HL) aus LISA
   • Gi*-Hotspotkarte (Z-Scores, ohne Permutationstests)
@@ -42,20 +42,39 @@ Konsolen-Aufruf – TESTMODUS:
 
 import os
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from multiprocessing import shared_memory
 
 import numpy as np
 import rasterio
+from rasterio.enums import Resampling
 from rasterio.windows import Window
 
 from libpysal.weights import lat2W, WSP
-from esda.moran import Moran, Moran_Local
+from esda.moran import Moran_Local
 from esda.getisord import G_Local
 
+try:
+    from numba import njit, prange, set_num_threads
+    HAVE_NUMBA = True
+except Exception:
+    HAVE_NUMBA = False
+
 
 # =====================================================================
 # Utility-Funktionen
 # =====================================================================
 
+# GDAL: Deflate-(De)Kompression mehrfädig, größerer Block-Cache (MB),
+# kein Verzeichnis-Listing beim Öffnen
+GDAL_ENV = dict(
+    GDAL_NUM_THREADS="ALL_CPUS",
+    GDAL_CACHEMAX=1024,
+    GDAL_DISABLE_READDIR_ON_OPEN="EMPTY_DIR",
+)
+
+
 def ensure_dir(path: str):
     """Stellt sicher, dass der Zielordner existiert."""
     d = os.path.dirname(path)
@@ -63,31 +82,343 @@ def ensure_dir(path: str):
         os.makedirs(d, exist_ok=True)
 
 
-def read_band(path: str, band: int = 1, dtype: str = "float64"):
-    """Liest ein Band als numpy-Array und mappt NoData auf NaN."""
+def read_band(path: str, band: int = 1, dtype: str = "float32", window=None):
+    """
+    Liest ein Band (optional nur ein Window) als numpy-Array und mappt
+    NoData auf NaN.
+    """
     with rasterio.open(path) as src:
-        arr = src.read(band).astype(dtype)
+        arr = src.read(band, window=window)
         profile = src.profile
         nodata = src.nodata
 
-    if nodata is not None:
-        arr[arr == nodata] = np.nan
+    # NoData-Pixel im Originaltyp bestimmen (NaN-NoData ist schon NaN)
+    nodata_mask = None
+    if nodata is not None and not np.isnan(nodata):
+        nodata_mask = arr == nodata
 
+    # liegt die Datei schon im Zieltyp vor, entfällt die Kopie ganz
+    arr = arr.astype(dtype, copy=False)
+    if nodata_mask is not None and np.issubdtype(arr.dtype, np.floating):
+        np.copyto(arr, np.nan, where=nodata_mask)
     return arr, profile
 
 
-def write_tif(path: str, arr: np.ndarray, profile: dict, dtype: str = "float32"):
-    """Schreibt ein Single-Band-TIF."""
+def write_tif(path: str, arr: np.ndarray, profile: dict, dtype: str = "float32",
+              resampling: Resampling = Resampling.average):
+    """
+    Schreibt ein Single-Band-TIF: gekachelt (512er Blöcke), blockweise
+    geschrieben, plus Overviews für schnelles Anzeigen in QGIS & Co.
+    resampling: Overview-Methode – für Klassen-Raster Resampling.nearest,
+    sonst entstehen gemittelte Zwischenklassen.
+    """
     ensure_dir(path)
+    is_float = np.issubdtype(np.dtype(dtype), np.floating)
     prof = profile.copy()
     prof.update(
         dtype=dtype,
         count=1,
         compress="deflate",
-        nodata=np.nan if np.issubdtype(np.dtype(dtype), np.floating) else 0
+        predictor=3 if is_float else 2,
+        tiled=True,
+        blockxsize=512,
+        blockysize=512,
+        num_threads="ALL_CPUS",
+        nodata=np.nan if is_float else 0
     )
     with rasterio.open(path, "w", **prof) as dst:
-        dst.write(arr.astype(dtype), 1)
+        # Block für Block → kein astype-Kopie des ganzen Rasters
+        for _, win in dst.block_windows(1):
+            dst.write(arr[win.toslices()].astype(dtype, copy=False), 1, window=win)
+        dst.build_overviews([2, 4, 8, 16], resampling)
+
+
+def read_trend_window(trend_path: str, origin, y0: int, y1: int, x0: int, x1: int):
+    """
+    Liest den Trend-Ausschnitt [y0:y1, x0:x1]; Koordinaten relativ zu
+    origin = (Zeile, Spalte) des Analysefensters (Testmodus-Ausschnitt).
+    """
+    oy, ox = origin
+    arr, _ = read_band(trend_path, band=1, dtype="float32",
+                       window=Window(ox + x0, oy + y0, x1 - x0, y1 - y0))
+    return arr
+
+
+def fast_quantiles(values: np.ndarray, qs, max_n: int = 10_000_000,
+                   sample_n: int = 1_000_000, seed: int = 42):
+    """
+    Quantile wie np.quantile (lineare Interpolation), aber über np.partition
+    statt Sortieren. Erwartet nur endliche Werte. Ab max_n Werten wird auf
+    einer festen Zufallsstichprobe (sample_n) gerechnet.
+    """
+    if values.size > max_n:
+        rng = np.random.default_rng(seed)
+        values = values[rng.integers(0, values.size, size=sample_n)]
+
+    pos = np.asarray(qs, dtype=np.float64) * (values.size - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, values.size - 1)
+    part = np.partition(values, np.unique(np.concatenate([lo, hi])))
+    return part[lo] + (part[hi] - part[lo]) * (pos - lo)
+
+
+def unpack_window(packed: np.ndarray, y0: int, y1: int, x0: int, x1: int):
+    """
+    Entpackt den Ausschnitt [y0:y1, x0:x1] einer zeilenweise mit
+    np.packbits(axis=1) gepackten Bool-Maske.
+    """
+    b0, b1 = x0 // 8, (x1 + 7) // 8
+    bits = np.unpackbits(packed[y0:y1, b0:b1], axis=1)
+    off = x0 - 8 * b0
+    return bits[:, off:off + (x1 - x0)].view(bool)
+
+
+# =====================================================================
+# Lokale Statistiken: Rook-CSR + LISA/Gi*-Kernel (Numba)
+# =====================================================================
+
+# Bewusst pro Tile statt einer globalen CSR über alle H·W Pixel: die globale
+# Matrix bräuchte ~4·H·W Indizes (mehrere GB bei 11k×11k), Tile-Zeilen sind
+# in globaler row-major Nummerierung nicht zusammenhängend (also kein billiger
+# Zeilen-Slice), und die Tile-Gewichte sollen ohnehin nur tile-lokale Nachbarn
+# enthalten. Der kompilierte Aufbau hier kostet O(Tile²) ohne Python-Overhead.
+if HAVE_NUMBA:
+    @njit(cache=True)
+    def build_rook_csr(good):
+        """
+        CSR-Gewichte (zeilenstandardisiert) der Rook-Nachbarschaft zwischen
+        den gültigen Pixeln eines Tiles. Knoten-IDs = row-major Reihenfolge
+        der gültigen Pixel, also dieselbe wie flat_trend[good_mask].
+        """
+        h, w = good.shape
+        id_map = np.full((h, w), -1, dtype=np.int32)
+        n = 0
+        for i in range(h):
+            for j in range(w):
+                if good[i, j]:
+                    id_map[i, j] = n
+                    n += 1
+
+        indptr = np.zeros(n + 1, dtype=np.int32)
+        indices = np.empty(4 * n, dtype=np.int32)
+        k = 0
+        for i in range(h):
+            for j in range(w):
+                r = id_map[i, j]
+                if r < 0:
+                    continue
+                # Nachbarn in aufsteigender ID-Reihenfolge: N, W, E, S
+                if i > 0 and id_map[i - 1, j] >= 0:
+                    indices[k] = id_map[i - 1, j]
+                    k += 1
+                if j > 0 and id_map[i, j - 1] >= 0:
+                    indices[k] = id_map[i, j - 1]
+                    k += 1
+                if j < w - 1 and id_map[i, j + 1] >= 0:
+                    indices[k] = id_map[i, j + 1]
+                    k += 1
+                if i < h - 1 and id_map[i + 1, j] >= 0:
+                    indices[k] = id_map[i + 1, j]
+                    k += 1
+                indptr[r + 1] = k
+
+        data = np.empty(k, dtype=np.float32)
+        for r in range(n):
+            a, b = indptr[r], indptr[r + 1]
+            for p in range(a, b):
+                data[p] = 1.0 / (b - a)
+
+        return indptr, indices[:k], data
+
+
+    @njit(parallel=True, cache=True)
+    def moran_local(y, indptr, indices, data, Is, q):
+        """
+        Lokaler Moran's I wie esda.Moran_Local(permutations=0) auf
+        zeilenstandardisierten Gewichten, geschrieben nach Is / q.
+        y darf float32 sein; Mittelwert und Quadratsummen laufen in float64.
+        Quadranten wie PySAL: 1 = HH, 2 = LH, 3 = LL, 4 = HL.
+        """
+        n = y.shape[0]
+        Is[:] = np.nan
+        q[:] = 0
+
+        mean = 0.0
+        for i in range(n):
+            mean += y[i]
+        mean /= n
+        ss = 0.0
+        for i in range(n):
+            d = y[i] - mean
+            ss += d * d
+        if ss == 0.0:
+            return  # konstantes Tile → kein I definiert
+        sd = np.sqrt(ss / n)
+        den = ss / (sd * sd)  # Σ z²
+
+        # z = (y - mean) / sd direkt im Kernel, ohne eigenes z-Array
+        for i in prange(n):
+            zi = (y[i] - mean) / sd
+            zl = 0.0
+            for p in range(indptr[i], indptr[i + 1]):
+                zl += data[p] * (y[indices[p]] - mean) / sd
+            Is[i] = (n - 1) * zi * zl / den
+            if zi > 0:
+                q[i] = 1 if zl > 0 else 4
+            else:
+                q[i] = 2 if zl > 0 else 3
+
+    @njit(parallel=True, cache=True)
+    def g_local_z(y, indptr, indices, data, zs):
+        """
+        Z-Scores von Getis-Ords G_i (ohne Selbstnachbar) in geschlossener Form,
+        wie esda.G_Local(permutations=0): Erwartung und Varianz unter
+        Randomisierung, jeweils ohne den Pixel selbst. Ergebnis nach zs.
+        """
+        n = y.shape[0]
+        zs[:] = np.nan
+
+        s = 0.0
+        s2 = 0.0
+        for i in range(n):
+            s += y[i]
+            s2 += y[i] * y[i]
+        N = n - 1
+
+        for i in prange(n):
+            lag = 0.0
+            card = 0.0
+            for p in range(indptr[i], indptr[i + 1]):
+                lag += data[p] * y[indices[p]]
+                card += data[p]
+            rest = s - y[i]
+            if rest == 0.0:
+                continue
+            mean = rest / N
+            var = (s2 - y[i] * y[i]) / N - mean * mean
+            vg = card * (N - card) / (N - 1) / (N * N) * var / (mean * mean)
+            if vg <= 0.0:
+                continue
+            zs[i] = (lag / rest - card / N) / np.sqrt(vg)
+
+
+def warmup_kernels():
+    """
+    Kompiliert die Numba-Kernel einmal im Hauptprozess mit denselben
+    Typ-Signaturen wie im Tile-Worker. Dank cache=True liegen sie danach in
+    __pycache__, und die Worker laden sie nur noch, statt parallel jeweils
+    selbst zu kompilieren.
+    """
+    if not HAVE_NUMBA:
+        return
+    good = np.ones((2, 2), dtype=bool)
+    y = np.arange(4, dtype=np.float32)
+    Is = np.empty(4, dtype=np.float32)
+    q = np.empty(4, dtype=np.uint8)
+    gi = np.empty(4, dtype=np.float32)
+    indptr, indices, data = build_rook_csr(good)
+    moran_local(y, indptr, indices, data, Is, q)
+    g_local_z(y, indptr, indices, data, gi)
+
+
+@lru_cache(maxsize=8)
+def full_rook_csr(h: int, w: int):
+    """
+    Rook-Gewichte des vollen h×w-Gitters als CSR. Alle inneren Tiles haben
+    dieselbe Form → nur Rand-Tiles bauen neu. Nicht verändern (geteilt)!
+    """
+    return lat2W(h, w, rook=True).sparse.tocsr()
+
+
+def tile_weights(good_mask, h_tile, w_tile):
+    """Rook-Gewichte der gültigen Pixel eines Tiles als PySAL-WSP (Fallback ohne Numba)."""
+    # Achtung: Reihenfolge von lat2W entspricht Flatten-Reihenfolge (row-major)
+    W_csr = full_rook_csr(h_tile, w_tile)
+    # Zeilen auf CSR, Spalten auf CSC schneiden – jeweils das schnelle Format
+    rows = W_csr[good_mask, :]
+    return WSP(rows.tocsc()[:, good_mask].tocsr())
+
+
+def local_stats(vec, good_mask, h_tile, w_tile, Is, q, gi):
+    """
+    LISA (I + Quadrant) und Gi*-Z-Scores für die gültigen Pixel eines Tiles,
+    geschrieben in die übergebenen Puffer Is / q / gi (Länge len(vec)).
+    Mit Numba über eigene CSR-Kernel, sonst über esda.
+    """
+    if HAVE_NUMBA:
+        indptr, indices, data = build_rook_csr(good_mask.reshape(h_tile, w_tile))
+        moran_local(vec, indptr, indices, data, Is, q)
+        g_local_z(vec, indptr, indices, data, gi)
+        return
+
+    W_tile = tile_weights(good_mask, h_tile, w_tile)
+    lisa = Moran_Local(vec, W_tile, permutations=0)
+    Is[:] = lisa.Is
+    q[:] = lisa.q
+    gi[:] = G_Local(vec, W_tile, permutations=0).Zs
+
+
+# =====================================================================
+# Globales Moran's I auf dem ganzen Raster
+# =====================================================================
+
+def rook_sum(a: np.ndarray):
+    """Summe der 4 Rook-Nachbarn je Pixel (fehlende Randnachbarn zählen 0)."""
+    out = np.zeros_like(a)
+    out[1:, :] += a[:-1, :]
+    out[:-1, :] += a[1:, :]
+    out[:, 1:] += a[:, :-1]
+    out[:, :-1] += a[:, 1:]
+    return out
+
+
+def global_moran(trend_path, origin, shape, valid_packed: np.ndarray,
+                 mean: float, n: int, block_rows: int = 1024):
+    """
+    Globales Moran's I über alle n gültigen Pixel (Mittelwert mean) mit
+    Rook-Nachbarschaft und zeilenstandardisierten Gewichten (wie esda.Moran,
+    transformation="r"). Liest den Trend in Zeilenstreifen mit 2 Zeilen
+    Halo, das Raster liegt nie komplett im Speicher.
+
+    Rückgabe: (I, E[I], Var[I] unter Normalitätsannahme)
+    """
+    H, W = shape
+    if n < 2:
+        raise RuntimeError("Zu wenige gültige Trendpixel für globales Moran's I!")
+
+    # Kreuzprodukt + Gewichtssummen S0/S1/S2 streifenweise
+    zwz = zz = s0 = s1 = s2 = 0.0
+    for r0 in range(0, H, block_rows):
+        r1 = min(H, r0 + block_rows)
+        e0, e1 = max(0, r0 - 2), min(H, r1 + 2)
+        t = read_trend_window(trend_path, origin, e0, e1, 0, W)
+        ok = unpack_window(valid_packed, e0, e1, 0, W) & np.isfinite(t)
+
+        # Streifen in float32, Summen unten in float64 akkumuliert
+        z = np.where(ok, t - np.float32(mean), np.float32(0.0))
+        deg = rook_sum(ok.astype(np.float32)) * ok
+        a = np.divide(1.0, deg, out=np.zeros_like(deg), where=deg > 0)  # w_ij = 1/deg_i
+        Rz, Ra, Ra2 = rook_sum(z), rook_sum(a), rook_sum(a * a)
+
+        # nur die Kernzeilen des Streifens zählen (Halo ist dort korrekt)
+        core = slice(r0 - e0, r1 - e0)
+        ok, z, a = ok[core], z[core], a[core]
+        Rz, Ra, Ra2 = Rz[core], Ra[core], Ra2[core]
+        has_nb = a > 0
+
+        zwz += float(np.sum(z * a * Rz, dtype=np.float64))
+        zz += float(np.sum(z * z, dtype=np.float64))
+        s0 += float(np.count_nonzero(has_nb))
+        # Σ_j (w_ij + w_ji)² = deg_i·a_i² + 2·a_i·Σa_j + Σa_j²   (deg_i·a_i² = a_i)
+        s1 += float(np.sum((a + 2.0 * a * Ra + Ra2)[ok], dtype=np.float64))
+        # (Zeilensumme + Spaltensumme)²
+        s2 += float(np.sum(((has_nb + Ra) ** 2)[ok], dtype=np.float64))
+    s1 *= 0.5
+
+    I = n / s0 * zwz / zz
+    EI = -1.0 / (n - 1)
+    VI_norm = (n * n * s1 - n * s2 + 3.0 * s0 * s0) / ((n * n - 1.0) * s0 * s0) - EI * EI
+    return I, EI, VI_norm
 
 
 # =====================================================================
@@ -104,7 +435,9 @@ def build_trend_qa_mask(shape, qa_folder, years, qa_min):
     """
 
     H, W = shape
-    qa_stack = []
+    # nur Summe + Anzahl gültiger Jahre pro Pixel halten, statt alle Jahre zu stapeln
+    qa_sum = np.zeros((H, W), dtype=np.float32)
+    qa_cnt = np.zeros((H, W), dtype=np.uint16)
 
     print("📥 Lade QA aller Jahre für Trend-QA…")
     for year in years:
@@ -113,18 +446,26 @@ def build_trend_qa_mask(shape, qa_folder, years, qa_min):
             f"suitability_{year}_MONTHLY_Macrolepiota_procera_vs_Parus_major.tif"
         )
         print(f"  → {year}: {qa_path}")
-        qa_year, _ = read_band(qa_path, band=2, dtype="float64")
-        if qa_year.shape != shape:
-            raise ValueError(
-                f"QA-Shape {qa_year.shape} passt nicht zur Trend-Shape {shape} "
-                f"(Jahr {year}, Datei {qa_path})."
-            )
-        qa_stack.append(qa_year)
-
-    qa_arr = np.stack(qa_stack, axis=0)  # (n_years, H, W)
-    qa_mean = np.nanmean(qa_arr, axis=0)
-
-    valid = (qa_mean >= qa_min) & np.isfinite(qa_mean)
+        with rasterio.open(qa_path) as src:
+            if src.shape != shape:
+                raise ValueError(
+                    f"QA-Shape {src.shape} passt nicht zur Trend-Shape {shape} "
+                    f"(Jahr {year}, Datei {qa_path})."
+                )
+            nodata = src.nodata
+
+            # blockweise entlang der internen GeoTIFF-Kacheln lesen
+            for _, win in src.block_windows(2):
+                v = src.read(2, window=win).astype(np.float32, copy=False)
+                if nodata is not None:
+                    v[v == nodata] = np.nan
+                ok = np.isfinite(v)
+                sl = win.toslices()
+                qa_sum[sl] += np.where(ok, v, 0.0)
+                qa_cnt[sl] += ok
+
+    # entspricht nanmean über die Jahre; Pixel ohne gültiges Jahr → ungültig
+    valid = (qa_cnt > 0) & (qa_sum >= qa_min * qa_cnt)
 
     n_valid = int(valid.sum())
     n_total = H * W
@@ -134,6 +475,94 @@ def build_trend_qa_mask(shape, qa_folder, years, qa_min):
     return valid
 
 
+# =====================================================================
+# Tile-Worker (Prozesspool, Raster im Shared Memory)
+# =====================================================================
+
+def shared_array(shape, dtype, fill=None):
+    """Legt ein numpy-Array in einem neuen SharedMemory-Block an."""
+    dtype = np.dtype(dtype)
+    size = max(1, int(np.prod(shape)) * dtype.itemsize)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    if fill is not None:
+        arr[...] = fill
+    return shm, arr
+
+
+# Worker-Zustand: einmal pro Prozess im Initializer angelegt
+_SHM = []
+_SHARED = {}
+_PARAMS = {}
+_SCRATCH = {}
+
+
+def _init_worker(specs, n_threads, q05, q95, tile, trend_path, origin):
+    """Initializer: Shared-Memory-Blöcke {key: (name, shape, dtype)} als Views öffnen."""
+    _PARAMS.update(q05=q05, q95=q95, trend_path=trend_path, origin=origin,
+                   # pro Worker nur seinen Anteil an Kernen für GDAL
+                   gdal_env={**GDAL_ENV, "GDAL_NUM_THREADS": str(n_threads)})
+    # Tile-große Puffer einmal pro Prozess, pro Tile nur vorne angeschnitten
+    _SCRATCH.update(
+        vec=np.empty(tile * tile, dtype=np.float32),
+        Is=np.empty(tile * tile, dtype=np.float32),
+        q=np.empty(tile * tile, dtype=np.uint8),
+        gi=np.empty(tile * tile, dtype=np.float32),
+    )
+    for key, (name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _SHM.append(shm)
+        _SHARED[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    if HAVE_NUMBA:
+        # Kerne auf die Worker aufteilen statt jeden Worker alle nutzen zu lassen
+        set_num_threads(n_threads)
+
+
+def _run_tile(bounds):
+    """
+    Berechnet LISA, Quadranten, Gi* und Quantil-Klasse für ein Tile und
+    schreibt sie direkt in die Shared-Memory-Raster. Gibt die Zahl gültiger
+    Pixel zurück.
+    """
+    y0, y1, x0, x1 = bounds
+
+    # Trend nur für dieses Tile von der Platte lesen
+    with rasterio.Env(**_PARAMS["gdal_env"]):
+        t_tile = read_trend_window(_PARAMS["trend_path"], _PARAMS["origin"], y0, y1, x0, x1)
+    v_tile = unpack_window(_SHARED["valid"], y0, y1, x0, x1)
+
+    # gültige Pixel (QA + endlicher Trend) in diesem Tile
+    good_2d = v_tile & np.isfinite(t_tile)
+
+    # Quantil-Klasse in einem Durchgang: -1 (<= q05), +1 (>= q95), sonst 0
+    lo = (t_tile <= _PARAMS["q05"]).view(np.int8)
+    hi = (t_tile >= _PARAMS["q95"]).view(np.int8)
+    np.subtract(hi, lo, out=_SHARED["quant"][y0:y1, x0:x1], where=good_2d)
+
+    n_good = np.count_nonzero(good_2d)
+    if n_good < 10:
+        return n_good
+
+    good_mask = good_2d.ravel()
+    vec = _SCRATCH["vec"][:n_good]
+    np.compress(good_mask, t_tile.reshape(-1), out=vec)
+
+    # LISA + Gi* nur zwischen gültigen Pixeln des Tiles
+    h_tile, w_tile = t_tile.shape
+    Is = _SCRATCH["Is"][:n_good]
+    q = _SCRATCH["q"][:n_good]
+    gi = _SCRATCH["gi"][:n_good]
+    local_stats(vec, good_mask, h_tile, w_tile, Is, q, gi)
+
+    # Boolesche 2-D-Maske direkt auf die Tile-Views: Reihenfolge row-major wie
+    # good_mask, kein flatten/reshape-Kopieren der Tiles
+    _SHARED["lisa"][y0:y1, x0:x1][good_2d] = Is
+    _SHARED["quad"][y0:y1, x0:x1][good_2d] = q
+    _SHARED["gi"][y0:y1, x0:x1][good_2d] = gi
+
+    return n_good
+
+
 # =====================================================================
 # Kernfunktion: Tiles verarbeiten
 # =====================================================================
@@ -144,27 +573,32 @@ def process_tiles(trend_path,
                   tile,
                   out_prefix,
                   years=(2017, 2018, 2019, 2020, 2021, 2022, 2023, 2024),
-                  test=False):
+                  test=False,
+                  workers=None):
     """
     Hauptpipeline:
-      - Trend laden
+      - Trend-Metadaten (Daten selbst nur fensterweise gelesen)
       - QA-Maske aus allen Jahren
       - optional Testmodus (zentraler Ausschnitt)
-      - globale Quantile + globaler Moran (Stichprobe)
+      - globale Quantile + globaler Moran (ganzes Raster)
       - Tile-basierte Berechnung von:
           LISA (Moran_Local),
           Quadranten,
           Gi* (G_Local),
           Quantilen (global, 5%/95%)
+      - Tiles laufen parallel in `workers` Prozessen (Default: alle Kerne)
     """
 
     # ---------------------------
-    # Trend laden
+    # Trend: nur Metadaten, Pixel werden fensterweise gelesen
     # ---------------------------
-    trend_full, profile = read_band(trend_path, band=1, dtype="float64")
-    H, W = trend_full.shape
     print("📥 Lade Trendkarte…")
+    with rasterio.open(trend_path) as src:
+        profile = src.profile
+        H, W = src.height, src.width
+        src_transform = src.transform
     print(f"   Größe: {W} × {H}")
+    origin = (0, 0)
 
     # ---------------------------
     # QA-Maske (über alle Jahre)
@@ -188,146 +622,133 @@ def process_tiles(trend_path,
               f"(y={y0}:{y1}, x={x0}:{x1})")
 
         # Ausschnitt
-        trend_full = trend_full[y0:y1, x0:x1]
+        origin = (y0, x0)
         valid_full = valid_full[y0:y1, x0:x1]
-        H, W = trend_full.shape
+        H, W = valid_full.shape
 
         # Profil-Transform anpassen
-        with rasterio.open(trend_path) as src:
-            window = Window(col_off=x0, row_off=y0, width=W, height=H)
-            transform = rasterio.windows.transform(window, src.transform)
-        profile["transform"] = transform
+        window = Window(col_off=x0, row_off=y0, width=W, height=H)
+        profile["transform"] = rasterio.windows.transform(window, src_transform)
         profile["height"] = H
         profile["width"] = W
 
+    # gültige QA-Pixel je Tile (obere Schranke für n_good) – Tiles ohne
+    # gültige Pixel gehen gar nicht erst an die Worker
+    tile_counts = np.add.reduceat(
+        np.add.reduceat(valid_full, np.arange(0, H, tile), axis=0, dtype=np.int64),
+        np.arange(0, W, tile), axis=1
+    )
+
+    # Maske ab hier nur noch bitgepackt halten (1 Bit statt 1 Byte pro Pixel)
+    valid_packed = np.packbits(valid_full, axis=1)
+    del valid_full
+
     # ---------------------------
     # Trendwerte nach QA filtern + globale Quantile
     # ---------------------------
     print("📊 Berechne globale Trend-Quantile (5% / 95%)…")
-    valid_trend = trend_full[valid_full]
-    valid_trend = valid_trend[np.isfinite(valid_trend)]
+    parts = []
+    for r0 in range(0, H, 1024):
+        r1 = min(H, r0 + 1024)
+        t = read_trend_window(trend_path, origin, r0, r1, 0, W)
+        parts.append(t[unpack_window(valid_packed, r0, r1, 0, W) & np.isfinite(t)])
+    valid_trend = np.concatenate(parts)
+    del parts
     if valid_trend.size == 0:
         raise RuntimeError("Kein gültiger Trendwert nach QA/NaN-Filter!")
 
-    q05 = float(np.nanquantile(valid_trend, 0.05))
-    q95 = float(np.nanquantile(valid_trend, 0.95))
+    # valid_trend ist bereits NaN-frei → Partition statt nanquantile
+    q05, q95 = (float(v) for v in fast_quantiles(valid_trend, (0.05, 0.95)))
     print(f"   5%-Quantil: {q05:.5f}")
     print(f"   95%-Quantil: {q95:.5f}")
+    trend_mean = float(valid_trend.mean(dtype=np.float64))
+    n_valid = valid_trend.size
+    del valid_trend
 
     # ---------------------------
-    # Globales Moran's I (Stichprobe)
-    # ---------------------------
-    print("📊 Berechne globales Moran's I (Stichprobe)…")
-    sample_size = min(250_000, valid_trend.size)
-    rng = np.random.default_rng(42)
-    sample_idx = rng.choice(valid_trend.size, size=sample_size, replace=False)
-    sample_vals = valid_trend[sample_idx]
-
-    side = int(np.sqrt(sample_size))
-    side = max(4, side)
-    cut = side * side
-    sample_vals = sample_vals[:cut]
-
-    W_sample = lat2W(side, side, rook=True)
-    moran_global = Moran(sample_vals, W_sample, permutations=0)
-
-    # ---------------------------
-    # Output-Arrays
-    # ---------------------------
-    lisa_full = np.full((H, W), np.nan, dtype="float32")
-    quad_full = np.zeros((H, W), dtype="uint8")
-    gi_full = np.full((H, W), np.nan, dtype="float32")
-    quant_full = np.zeros((H, W), dtype="float32")
-
-    nx = (W + tile - 1) // tile
-    ny = (H + tile - 1) // tile
-    n_tiles = nx * ny
-
-    print(f"📦 Prozessiere {n_tiles} Tiles ({nx}×{ny})…")
-
-    # ---------------------------
-    # Tiles durchlaufen
+    # Globales Moran's I (echte Rook-Nachbarschaft, alle gültigen Pixel)
     # ---------------------------
-    tile_counter = 0
-    for ty in range(ny):
-        for tx in range(nx):
-            tile_counter += 1
-            y0 = ty * tile
-            x0 = tx * tile
-            y1 = min(H, y0 + tile)
-            x1 = min(W, x0 + tile)
-
-            print(f"[Tile {tile_counter}/{n_tiles}] y={y0}:{y1} x={x0}:{x1}")
-
-            t_tile = trend_full[y0:y1, x0:x1]
-            v_tile = valid_full[y0:y1, x0:x1]
-
-            flat_trend = t_tile.flatten()
-            flat_valid = v_tile.flatten()
-
-            # Indizes gültiger Pixel in diesem Tile
-            good_mask = flat_valid & np.isfinite(flat_trend)
-            n_good = int(good_mask.sum())
-            if n_good < 10:
-                continue
-
-            vec = flat_trend[good_mask].astype("float64")
-
-            # Spatial Weights für das komplette Tile (rechteckig)
-            h_tile, w_tile = t_tile.shape
-            W_full = lat2W(h_tile, w_tile, rook=True)
-
-            # Weights auf gültige Pixel subsetten (WSP)
-            # Achtung: Reihenfolge von lat2W entspricht Flatten-Reihenfolge (row-major)
-            W_sparse_full = W_full.sparse
-            W_sparse_sub = W_sparse_full[good_mask, :][:, good_mask]
-            W_tile = WSP(W_sparse_sub)
-
-            # ---------------------------
-            # Lokaler Moran (LISA)
-            # ---------------------------
-            lisa = Moran_Local(vec, W_tile, permutations=0)
-            Is = lisa.Is.astype("float32")
-            q = lisa.q.astype("uint8")
-
-            lisa_sub = lisa_full[y0:y1, x0:x1].flatten()
-            quad_sub = quad_full[y0:y1, x0:x1].flatten()
-            lisa_sub[good_mask] = Is
-            quad_sub[good_mask] = q
-            lisa_full[y0:y1, x0:x1] = lisa_sub.reshape(h_tile, w_tile)
-            quad_full[y0:y1, x0:x1] = quad_sub.reshape(h_tile, w_tile)
-
-            # ---------------------------
-            # Gi* (lokaler Hotspot, Z-Score)
-            # ---------------------------
-            gi = G_Local(vec, W_tile, permutations=0).Zs.astype("float32")
-            gi_sub = gi_full[y0:y1, x0:x1].flatten()
-            gi_sub[good_mask] = gi
-            gi_full[y0:y1, x0:x1] = gi_sub.reshape(h_tile, w_tile)
+    print("📊 Berechne globales Moran's I…")
+    moran_I, moran_EI, moran_VI = global_moran(
+        trend_path, origin, (H, W), valid_packed, trend_mean, n_valid
+    )
 
     # ---------------------------
-    # Quantile-Karte (global, mit QA)
+    # Maske + Ergebnisraster in Shared Memory (nicht pro Tile picklen)
     # ---------------------------
-    print("📊 Erzeuge globale Quantile-Karte…")
-    mask_valid = valid_full & np.isfinite(trend_full)
-    quant_full[(trend_full <= q05) & mask_valid] = -1.0
-    quant_full[(trend_full >= q95) & mask_valid] = 1.0
-    # Rest bleibt 0.0 (Mittelfeld oder ungültig)
-
-    # =================================================================
-    # Outputs schreiben
-    # =================================================================
-    moran_path = out_prefix + "_moran_global.txt"
-    with open(moran_path, "w") as f:
-        f.write("Moran's I (global, Stichprobe aus allen gültigen Trendpixeln)\n")
-        f.write(f"I   = {moran_global.I}\n")
-        f.write(f"E[I] = {moran_global.EI}\n")
-        f.write(f"Var = {moran_global.VI_norm}\n")
-
-    write_tif(out_prefix + "_lisa.tif", lisa_full, profile, dtype="float32")
-    write_tif(out_prefix + "_quad.tif", quad_full, profile, dtype="uint8")
-    write_tif(out_prefix + "_gi.tif", gi_full, profile, dtype="float32")
-    write_tif(out_prefix + "_quantiles.tif", quant_full, profile, dtype="float32")
+    # Zugriff nur über `shared`, damit vor close() keine Views übrig bleiben
+    shms = []
+    shared = {}
+    specs = {}
+
+    def to_shared(key, shape, dtype, fill=None):
+        shm, arr = shared_array(shape, dtype, fill)
+        shms.append(shm)
+        shared[key] = arr
+        specs[key] = (shm.name, arr.shape, arr.dtype.str)
+        return arr
+
+    try:
+        to_shared("valid", valid_packed.shape, valid_packed.dtype)[...] = valid_packed
+        del valid_packed
+
+        to_shared("lisa", (H, W), "float32", np.nan)
+        to_shared("quad", (H, W), "uint8", 0)
+        to_shared("gi", (H, W), "float32", np.nan)
+        # Quantile-Karte (global, mit QA); ungültig/Mittelfeld bleibt 0.0
+        to_shared("quant", (H, W), "float32", 0.0)
+
+        ny, nx = tile_counts.shape
+
+        bounds = [
+            (ty * tile, min(H, ty * tile + tile), tx * tile, min(W, tx * tile + tile))
+            for ty in range(ny)
+            for tx in range(nx)
+            if tile_counts[ty, tx] > 0
+        ]
+        n_tiles = len(bounds)
+
+        workers = workers or os.cpu_count() or 1
+        n_threads = max(1, (os.cpu_count() or 1) // workers)
+
+        warmup_kernels()
+        print(f"📦 Prozessiere {n_tiles} Tiles ({nx}×{ny}, {nx * ny - n_tiles} leer "
+              f"übersprungen) mit {workers} Prozessen…")
+
+        # ---------------------------
+        # Tiles durchlaufen
+        # ---------------------------
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(specs, n_threads, q05, q95, tile,
+                                           trend_path, origin)) as pool:
+            results = pool.map(_run_tile, bounds, chunksize=max(1, n_tiles // (8 * workers)))
+            for tile_counter, ((y0, y1, x0, x1), n_good) in enumerate(zip(bounds, results), 1):
+                print(f"[Tile {tile_counter}/{n_tiles}] y={y0}:{y1} x={x0}:{x1} "
+                      f"({n_good} gültig)")
+
+        # =================================================================
+        # Outputs schreiben
+        # =================================================================
+        moran_path = out_prefix + "_moran_global.txt"
+        with open(moran_path, "w") as f:
+            f.write("Moran's I (global, alle gültigen Trendpixel, Rook-Nachbarschaft)\n")
+            f.write(f"I   = {moran_I}\n")
+            f.write(f"E[I] = {moran_EI}\n")
+            f.write(f"Var = {moran_VI}\n")
+
+        write_tif(out_prefix + "_lisa.tif", shared["lisa"], profile, dtype="float32")
+        write_tif(out_prefix + "_quad.tif", shared["quad"], profile, dtype="uint8",
+                  resampling=Resampling.nearest)
+        write_tif(out_prefix + "_gi.tif", shared["gi"], profile, dtype="float32")
+        write_tif(out_prefix + "_quantiles.tif", shared["quant"], profile, dtype="float32",
+                  resampling=Resampling.nearest)
+
+    finally:
+        shared.clear()
+        for shm in shms:
+            shm.close()
+            shm.unlink()
 
     print("🎉 Fertig! Dateien gespeichert unter:")
     print("  ", moran_path)
@@ -355,17 +776,21 @@ def main():
                     help="Prefix für Output-Dateien")
     ap.add_argument("--test", action="store_true",
                     help="Nur zentralen max. 2048×2048-Ausschnitt analysieren")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="Anzahl paralleler Tile-Prozesse (Default: alle Kerne)")
     args = ap.parse_args()
 
-    process_tiles(
-        trend_path=args.trend,
-        qa_folder=args.qa_folder,
-        qa_min=args.qa_min,
-        tile=args.tile,
-        out_prefix=args.out_prefix,
-        years=(2017, 2018, 2019, 2020, 2021, 2022, 2023, 2024),
-        test=args.test
-    )
+    with rasterio.Env(**GDAL_ENV):
+        process_tiles(
+            trend_path=args.trend,
+            qa_folder=args.qa_folder,
+            qa_min=args.qa_min,
+            tile=args.tile,
+            out_prefix=args.out_prefix,
+            years=(2017, 2018, 2019, 2020, 2021, 2022, 2023, 2024),
+            test=args.test,
+            workers=args.workers
+        )
 
 
 if __name__ == "__main__":
@@ -17,6 +17,8 @@ Wichtig: Das ist eine *bauminterne* „Suitability“, kein Gesamtmodell-Output.
 
 import json
 import argparse
+import orjson
+from functools import lru_cache
 from pathlib import Path
 
 # ---------------------------------------------------------
@@ -35,6 +37,20 @@ RANGES = {
     "geary": [0.0, 1.5],
 }
 
+DEFAULT_PALETTE = ["#dddddd", "#aaaaaa", "#666666"]
+
+# Feature-Kern (nach 'mXX_') → (Label-Vorlage, Palette, Range)
+SEMANTICS = {
+    "ndvi_mean":  ("Vegetationsdichte ({season}, NDVI)", NDVI_PALETTE, RANGES["ndvi_mean"]),
+    "ndwi_mean":  ("Feuchtigkeit ({season}, NDWI)", NDWI_PALETTE, RANGES["ndwi_mean"]),
+    "moran_ndvi": ("Vegetations-Cluster ({season}, Moran)", MORAN_PALETTE, RANGES["moran"]),
+    "moran_ndwi": ("Feuchtigkeits-Cluster ({season}, Moran)", MORAN_PALETTE, RANGES["moran"]),
+    "geary_ndvi": ("Vegetations-Heterogenität ({season}, Geary)", GEARY_PALETTE, RANGES["geary"]),
+    "geary_ndwi": ("Feuchtigkeits-Heterogenität ({season}, Geary)", GEARY_PALETTE, RANGES["geary"]),
+}
+
+SEASONS = {7: "Sommer", 8: "Sommer", 9: "Sommer", 10: "Herbst", 11: "Herbst", 12: "Herbst"}
+
 # Viridis-Skala für Suitability (0–1)
 VIRIDIS = [
     "#440154", "#482475", "#414487", "#355F8D", "#2A788E",
@@ -57,8 +73,7 @@ def load_xgb_tree(dump_json_path, tree_index=0):
     dump_json_path = Path(dump_json_path)
     print(f"→ Lade Dump: {dump_json_path}")
 
-    with dump_json_path.open("r") as f:
-        dump = json.load(f)
+    dump = orjson.loads(dump_json_path.read_bytes())
 
     if not isinstance(dump, list):
         raise ValueError("❌ Dump ist kein list-Format – erwarte Liste von Bäumen.")
@@ -81,31 +96,43 @@ def convert_xgb_tree(node):
     Konvertiert XGBoost-Node-Struktur in:
       - Leaf:   {"leaf": float}
       - Split:  {"feature": str, "threshold": float, "yes": {...}, "no": {...}}
+    Iterativ mit Stack (Knoten, Ziel-Dict) – keine Rekursionsgrenze.
     """
-
-    # Leaf
-    if "leaf" in node:
-        leaf_val = float(node["leaf"])
-        print(f"Leaf erkannt: {leaf_val}")
-        return {"leaf": leaf_val}
-
-    # Split
-    children = node.get("children", [])
-    if len(children) != 2:
-        print(f"⚠ WARNUNG: Node {node.get('nodeid')} hat {len(children)} Kinder → als Leaf degradiert")
-        return {"leaf": 0.0}
-
-    return {
-        "feature": node["split"],
-        "threshold": float(node["split_condition"]),
-        "yes": convert_xgb_tree(children[0]),
-        "no":  convert_xgb_tree(children[1]),
-    }
+    root = {}
+    stack = [(node, root)]
+
+    while stack:
+        src, out = stack.pop()
+
+        # Leaf
+        if "leaf" in src:
+            leaf_val = float(src["leaf"])
+            print(f"Leaf erkannt: {leaf_val}")
+            out["leaf"] = leaf_val
+            continue
+
+        # Split
+        children = src.get("children", [])
+        if len(children) != 2:
+            print(f"⚠ WARNUNG: Node {src.get('nodeid')} hat {len(children)} Kinder → als Leaf degradiert")
+            out["leaf"] = 0.0
+            continue
+
+        out["feature"] = src["split"]
+        out["threshold"] = float(src["split_condition"])
+        out["yes"] = {}
+        out["no"] = {}
+        # "no" zuerst auf den Stack → "yes" wird zuerst abgearbeitet
+        stack.append((children[1], out["no"]))
+        stack.append((children[0], out["yes"]))
+
+    return root
 
 # ---------------------------------------------------------
 # 3) Feature-Semantik (Labels, Paletten, Ranges)
 # ---------------------------------------------------------
 
+@lru_cache(maxsize=None)
 def infer_semantics(raw_feature: str):
     """
     Erwartet Feature-Namen wie:
@@ -113,73 +140,34 @@ def infer_semantics(raw_feature: str):
       m12_ndwi_mean
       m10_moran_ndvi
       m09_geary_ndwi
-    und leitet Label, Palette, Range ab.
+    und leitet Label, Palette, Range ab (gecacht – viele Splits teilen
+    sich ein Feature; Ergebnis daher nicht verändern).
     """
     print(f"→ Semantik für Feature: {raw_feature}")
 
+    fallback = {
+        "label": raw_feature,
+        "palette": DEFAULT_PALETTE,
+        "range": [0.0, 1.0],
+    }
+
     if not raw_feature.startswith("m") or "_" not in raw_feature:
-        # Fallback
-        return {
-            "label": raw_feature,
-            "palette": ["#dddddd", "#aaaaaa", "#666666"],
-            "range": [0.0, 1.0],
-        }
+        return fallback
 
     try:
         month = int(raw_feature[1:3])
-        rest = raw_feature[4:]  # Teil nach 'mXX_'
-    except Exception:
-        return {
-            "label": raw_feature,
-            "palette": ["#dddddd", "#aaaaaa", "#666666"],
-            "range": [0.0, 1.0],
-        }
-
-    # Saison
-    if month in (7, 8, 9):
-        season = "Sommer"
-    elif month in (10, 11, 12):
-        season = "Herbst"
-    else:
-        season = "Saison"
-
-    # Defaults
-    label = raw_feature
-    palette = ["#dddddd", "#aaaaaa", "#666666"]
-    rng = [0.0, 1.0]
-
-    if rest.startswith("ndvi_mean"):
-        label = f"Vegetationsdichte ({season}, NDVI)"
-        palette = NDVI_PALETTE
-        rng = RANGES["ndvi_mean"]
-
-    elif rest.startswith("ndwi_mean"):
-        label = f"Feuchtigkeit ({season}, NDWI)"
-        palette = NDWI_PALETTE
-        rng = RANGES["ndwi_mean"]
-
-    elif rest.startswith("moran_ndvi"):
-        label = f"Vegetations-Cluster ({season}, Moran)"
-        palette = MORAN_PALETTE
-        rng = RANGES["moran"]
-
-    elif rest.startswith("moran_ndwi"):
-        label = f"Feuchtigkeits-Cluster ({season}, Moran)"
-        palette = MORAN_PALETTE
-        rng = RANGES["moran"]
-
-    elif rest.startswith("geary_ndvi"):
-        label = f"Vegetations-Heterogenität ({season}, Geary)"
-        palette = GEARY_PALETTE
-        rng = RANGES["geary"]
-
-    elif rest.startswith("geary_ndwi"):
-        label = f"Feuchtigkeits-Heterogenität ({season}, Geary)"
-        palette = GEARY_PALETTE
-        rng = RANGES["geary"]
+    except ValueError:
+        return fallback
 
+    # Teil nach 'mXX_', die ersten zwei Tokens bestimmen den Typ
+    key = "_".join(raw_feature[4:].split("_", 2)[:2])
+    sem = SEMANTICS.get(key)
+    if sem is None:
+        return fallback
+
+    label, palette, rng = sem
     return {
-        "label": label,
+        "label": label.format(season=SEASONS.get(month, "Saison")),
         "palette": palette,
         "range": rng,
     }
@@ -191,15 +179,17 @@ def enrich_tree(node):
       - palette
       - range
     hinzu.
-    Leafs bleiben unverändert.
+    Leafs bleiben unverändert. Iterativ, damit tiefe Bäume kein
+    Rekursionslimit sprengen.
     """
-    if "leaf" in node:
-        return node
-
-    info = infer_semantics(node["feature"])
-    node.update(info)
-    node["yes"] = enrich_tree(node["yes"])
-    node["no"]  = enrich_tree(node["no"])
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        if "leaf" in n:
+            continue
+        n.update(infer_semantics(n["feature"]))
+        stack.append(n["yes"])
+        stack.append(n["no"])
     return node
 
 # ---------------------------------------------------------
@@ -319,6 +309,30 @@ g.append("g")
 // ---------------- Knoten ----------------
 const defs = svg.append("defs");
 
+// ein <linearGradient> pro Palette, nicht pro Knoten
+const gradientIds = new Map();
+
+function gradientIdFor(pal) {
+  const key = pal.join("|");
+  if (gradientIds.has(key)) return gradientIds.get(key);
+
+  const gradId = "grad_" + gradientIds.size;
+  const grad = defs.append("linearGradient")
+    .attr("id", gradId)
+    .attr("x1", "0%").attr("x2", "100%")
+    .attr("y1", "0%").attr("y2", "0%");
+
+  // 3-Stützfarben → kontinuierlicher Verlauf
+  pal.forEach((c, i) => {
+    grad.append("stop")
+      .attr("offset", (i / (pal.length - 1)) * 100 + "%")
+      .attr("stop-color", c);
+  });
+
+  gradientIds.set(key, gradId);
+  return gradId;
+}
+
 function thresholdX(d) {
   const data = d.data;
   if (!data.range || data.threshold == null) return 0;
@@ -359,19 +373,7 @@ node.each(function(d){
 
   // Decision-Knoten: Feature-Verlauf als Gradient
   const pal = d.data.palette || ["#dddddd", "#aaaaaa", "#666666"];
-  const gradId = "grad_" + Math.random().toString(36).slice(2);
-
-  const grad = defs.append("linearGradient")
-    .attr("id", gradId)
-    .attr("x1", "0%").attr("x2", "100%")
-    .attr("y1", "0%").attr("y2", "0%");
-
-  // 3-Stützfarben → kontinuierlicher Verlauf
-  pal.forEach((c, i) => {
-    grad.append("stop")
-      .attr("offset", (i / (pal.length - 1)) * 100 + "%")
-      .attr("stop-color", c);
-  });
+  const gradId = gradientIdFor(pal);
 
   // Hintergrund-Rechteck des Knotens
   gNode.append("rect")
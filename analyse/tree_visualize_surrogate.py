@@ -6,21 +6,37 @@ Visualisiert den Surrogate Tree als HTML/D3.
 """
 
 import argparse
-import json
+import math
+from html import escape
 from pathlib import Path
 
+try:
+    import orjson
+    HAVE_ORJSON = True
+except Exception:
+    import json
+    HAVE_ORJSON = False
 
-def export_html(tree_json, out_path):
-    out_path = Path(out_path)
 
-    # JSON als Text für D3
-    tree_json_str = json.dumps(tree_json, ensure_ascii=False)
+def dumps_text(obj):
+    # orjson schreibt UTF-8 direkt in einen Puffer; Umlaute bleiben wie bei ensure_ascii=False
+    if HAVE_ORJSON:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def load_json(path):
+    if HAVE_ORJSON:
+        return orjson.loads(Path(path).read_bytes())
+    return json.loads(Path(path).read_text(encoding="utf-8"))
 
-    # ----------------------------------------
-    # ⚠️ Nur EIN f-string-Bereich – JSON wird eingesetzt.
-    # Rest ist RAW STRING → JavaScript bleibt unberührt.
-    # ----------------------------------------
-    html = r"""<!DOCTYPE html>
+
+# ----------------------------------------
+# ⚠️ RAW STRING → JavaScript bleibt unberührt.
+# TREE_JSON_DATA / PALETTES_JSON_DATA / MIN_FRAME_PX_DATA sind Platzhalter, das Template wird
+# einmal beim Import daran zerlegt.
+# ----------------------------------------
+_RAW_TEMPLATE = r"""<!DOCTYPE html>
 <meta charset="utf-8">
 <title>Surrogate Tree – ML-Erklärung</title>
 
@@ -31,17 +47,22 @@ body {
     padding: 1rem;
     background: #fafafa;
 }
-.label {
-    font-size: 12px;
-    text-anchor: middle;
+#stage {
+    position: relative;
 }
-.edge-label {
-    fill: #666;
-    font-size: 11px;
+#svg {
+    position: absolute;
+    left: 0;
+    top: 0;
+    pointer-events: none;
 }
 </style>
 
-<svg id="svg"></svg>
+<!-- Baum auf einem Canvas, SVG nur noch für die Suitability-Skala -->
+<div id="stage">
+    <canvas id="tree-canvas"></canvas>
+    <svg id="svg"></svg>
+</div>
 
 <script src="https://d3js.org/d3.v7.min.js"></script>
 
@@ -52,6 +73,9 @@ body {
 // -----------------------------
 const treeData = TREE_JSON_DATA;
 
+// Paletten aus dem JSON (Schlüssel = "pal" am Knoten), sonst Fallback unten
+const palettes = PALETTES_JSON_DATA;
+
 // Farbpaletten für Featuretypen
 const NDVI  = ["#f2f2f2", "#a3c586", "#2f6b3a"];
 const NDWI  = ["#f7fbff", "#6baed6", "#08519c"];
@@ -78,13 +102,16 @@ function paletteForFeature(name){
     return ["#eee","#ccc","#999"];
 }
 
-// SVG Setup
+// Setup
 const svg = d3.select("#svg");
+const canvas = document.getElementById("tree-canvas");
+const ctx = canvas.getContext("2d");
 const dx = 260;
 const dy = 200;
 const nodeW = 260;
 const nodeH = 70;
 const padding = 200;
+const FONT = "12px system-ui, sans-serif";
 
 // Baumhierarchie
 const root = d3.hierarchy(treeData, d => {
@@ -94,19 +121,77 @@ const root = d3.hierarchy(treeData, d => {
     return c.length?c:null;
 });
 
-d3.tree().nodeSize([dx,dy])(root);
+// -----------------------------
+// Kleine Teilbäume einklappen ("minFrameSize")
+// -----------------------------
+// Liegen alle Leaves eines Teilbaums auf der Skala weniger als
+// MIN_FRAME_PX auseinander, wird er zu einem Platzhalter zusammengefasst.
+// Passiert vor dem Layout, damit d3.tree() nur die sichtbaren Knoten setzt.
+const MIN_FRAME_PX = MIN_FRAME_PX_DATA;
+
+root.leaves().forEach(l => { l.data.suit = sigmoid(l.data.leaf); });
+
+root.eachAfter(d => {
+    if(!d.children){
+        d.suitMin = d.suitMax = d.suitSum = d.data.suit;
+        d.nLeaves = 1;
+        return;
+    }
+    d.suitMin = Infinity; d.suitMax = -Infinity;
+    d.suitSum = 0; d.nLeaves = 0;
+    for(const c of d.children){
+        d.suitMin = Math.min(d.suitMin, c.suitMin);
+        d.suitMax = Math.max(d.suitMax, c.suitMax);
+        d.suitSum += c.suitSum;
+        d.nLeaves += c.nLeaves;
+    }
+});
 
-// Autosize SVG
-let minX=1e9,maxX=-1e9, minY=1e9,maxY=-1e9;
-root.each(d=>{
-    minX=Math.min(minX,d.x);
-    maxX=Math.max(maxX,d.x);
-    minY=Math.min(minY,d.y);
-    maxY=Math.max(maxY,d.y);
+// Skalenbreite des vollen Baums (Leaves mindestens dx auseinander)
+const fullBarW = Math.max(1, (root.nLeaves - 1)*dx - 160);
+
+root.eachBefore(d => {
+    if(d.parent && d.children && (d.suitMax - d.suitMin)*fullBarW < MIN_FRAME_PX){
+        d.children = null;
+        d.data._collapsed = true;
+        d.data.suit = d.suitSum / d.nLeaves;
+    }
 });
 
-svg.attr("width",(maxX-minX)+2*padding);
-svg.attr("height",(maxY-minY)+3*padding);
+d3.tree().nodeSize([dx,dy])(root);
+
+// Autosize – Ausdehnung in einer Schleife über die (sichtbaren) Knoten
+const nodes = root.descendants();
+let minX=Infinity,maxX=-Infinity, minY=Infinity,maxY=-Infinity;
+for(const d of nodes){
+    if(d.x < minX) minX = d.x;
+    if(d.x > maxX) maxX = d.x;
+    if(d.y < minY) minY = d.y;
+    if(d.y > maxY) maxY = d.y;
+}
+
+// Skala-Geometrie
+const barY = maxY + 160;
+const barX = minX + 80;
+const barW = (maxX-minX) - 160;
+const barH = 35;
+
+const W = (maxX-minX)+2*padding;
+const H = (maxY-minY)+3*padding;
+
+// Browser begrenzen Canvas-Kanten (~32k px) → Pixeldichte ggf. reduzieren
+const MAX_CANVAS_PX = 32000;
+const density = Math.min(window.devicePixelRatio || 1, MAX_CANVAS_PX/W, MAX_CANVAS_PX/H);
+
+canvas.width  = Math.ceil(W*density);
+canvas.height = Math.ceil(H*density);
+canvas.style.width  = W + "px";
+canvas.style.height = H + "px";
+ctx.scale(density, density);
+ctx.translate(padding-minX, padding-minY);
+
+svg.attr("width",W);
+svg.attr("height",H);
 
 const g = svg.append("g")
     .attr("transform",`translate(${padding-minX},${padding-minY})`);
@@ -117,129 +202,132 @@ const defs = svg.append("defs");
 function edgeStartX(node, side){
     const thr = node.data.threshold ?? 0.5;
     const x_t = -nodeW/2 + thr*nodeW;
-    return side==="yes" ? x_t-6 : x_t+6;
+    return node.x + (side==="yes" ? x_t-6 : x_t+6);
 }
 
-// Bezier-Link
+// Bezier-Link für Kanten und Leaf→Skala, zeichnet direkt in den Canvas-Kontext
 const link = d3.linkVertical()
     .x(d=>d.x)
-    .y(d=>d.y);
+    .y(d=>d.y)
+    .context(ctx);
+
+// Gradient pro Palette nur einmal anlegen (lokale Knotenkoordinaten)
+const gradientCache = new Map();
+function gradientFor(pal){
+    const key = pal.join("|");
+    if(!gradientCache.has(key)){
+        const grad = ctx.createLinearGradient(-nodeW/2, 0, nodeW/2, 0);
+        pal.forEach((c,i)=>grad.addColorStop(i/(pal.length-1), c));
+        gradientCache.set(key, grad);
+    }
+    return gradientCache.get(key);
+}
 
 // -----------------------------
 // Kanten zeichnen
 // -----------------------------
-g.append("g")
- .selectAll("path")
- .data(root.links())
- .join("path")
- .attr("fill","none")
- .attr("stroke","#777")
- .attr("stroke-width",1.5)
- .attr("d", d => {
-     const side = (d.target.data._edge==="Ja")?"yes":"no";
-     const sx = edgeStartX(d.source, side);
-     const sy = d.source.y;
-
-     return link({
-        source:{x:sx,y:sy},
-        target:{x:d.target.x,y:d.target.y}
-     });
- });
+const links = root.links();
+
+ctx.beginPath();
+links.forEach(d => {
+    const side = (d.target.data._edge==="Ja")?"yes":"no";
+    link({
+        source:{x:edgeStartX(d.source, side), y:d.source.y},
+        target:{x:d.target.x, y:d.target.y}
+    });
+});
+ctx.strokeStyle = "#777";
+ctx.lineWidth = 1.5;
+ctx.stroke();
 
 // Edge-Labels
-g.append("g")
- .selectAll("text")
- .data(root.links())
- .join("text")
- .attr("class","edge-label")
- .attr("x", d=>(d.source.x+d.target.x)/2)
- .attr("y", d=>(d.source.y+d.target.y)/2 - 6)
- .text(d=>d.target.data._edge);
+ctx.font = "11px system-ui, sans-serif";
+ctx.textAlign = "left";
+ctx.fillStyle = "#666";
+links.forEach(d => {
+    ctx.fillText(d.target.data._edge,
+        (d.source.x+d.target.x)/2,
+        (d.source.y+d.target.y)/2 - 6);
+});
 
 // -----------------------------
 // Knoten
 // -----------------------------
-const node = g.append("g")
- .selectAll("g")
- .data(root.descendants())
- .join("g")
- .attr("transform", d=>`translate(${d.x},${d.y})`);
-
-node.each(function(d){
-    const n = d3.select(this);
+ctx.font = FONT;
+ctx.textAlign = "center";
+
+nodes.forEach(d => {
+    ctx.save();
+    ctx.translate(d.x, d.y);
+
+    // -------- EINGEKLAPPT ----------
+    if(d.data._collapsed){
+        ctx.beginPath();
+        ctx.roundRect(-70, -25, 140, 50, 10);
+        ctx.fillStyle = "#ccc";
+        ctx.fill();
+        ctx.strokeStyle = "#888";
+        ctx.lineWidth = 1;
+        ctx.stroke();
+
+        ctx.fillStyle = "#000";
+        ctx.fillText(`${d.nLeaves} Blätter`, 0, 4);
+
+        ctx.restore();
+        return;
+    }
 
     // -------- LEAF ----------
     if(d.data.leaf !== undefined){
-        const suit = sigmoid(d.data.leaf);
-        d.data.suit = suit;
+        const suit = d.data.suit;
 
-        n.append("rect")
-         .attr("x",-70).attr("y",-25)
-         .attr("width",140).attr("height",50)
-         .attr("rx",10)
-         .attr("fill",VIRIDIS[Math.floor(suit*(VIRIDIS.length-1))])
-         .attr("stroke","#333");
+        ctx.beginPath();
+        ctx.roundRect(-70, -25, 140, 50, 10);
+        ctx.fillStyle = VIRIDIS[Math.floor(suit*(VIRIDIS.length-1))];
+        ctx.fill();
+        ctx.strokeStyle = "#333";
+        ctx.lineWidth = 1;
+        ctx.stroke();
 
-        n.append("text")
-         .attr("class","label")
-         .attr("dy",4)
-         .text(`suit = ${suit.toFixed(3)}`);
+        ctx.fillStyle = "#000";
+        ctx.fillText(`suit = ${suit.toFixed(3)}`, 0, 4);
 
+        ctx.restore();
         return;
     }
 
     // -------- SPLIT NODE ----------
-    const pal = paletteForFeature(d.data.feature);
-
-    const gradId = "grad_"+Math.random().toString(36).slice(2);
-    const grad = defs.append("linearGradient")
-        .attr("id",gradId)
-        .attr("x1","0%").attr("x2","100%")
-        .attr("y1","0%").attr("y2","0%");
-
-    pal.forEach((c,i)=>{
-        grad.append("stop")
-            .attr("offset",(i/(pal.length-1))*100+"%")
-            .attr("stop-color",c);
-    });
-
-    n.append("rect")
-     .attr("x",-nodeW/2).attr("y",-nodeH/2)
-     .attr("width",nodeW).attr("height",nodeH)
-     .attr("rx",12)
-     .attr("fill",`url(#${gradId})`)
-     .attr("stroke","#333");
-
-    n.append("text")
-     .attr("class","label")
-     .attr("y",-nodeH/2 - 10)
-     .text(d.data.feature);
-
-    n.append("text")
-     .attr("class","label")
-     .attr("y",nodeH/2 + 14)
-     .text(`Schwelle: ${d.data.threshold.toFixed(3)}`);
+    ctx.beginPath();
+    ctx.roundRect(-nodeW/2, -nodeH/2, nodeW, nodeH, 12);
+    ctx.fillStyle = gradientFor(palettes[d.data.pal] || paletteForFeature(d.data.feature));
+    ctx.fill();
+    ctx.strokeStyle = "#333";
+    ctx.lineWidth = 1;
+    ctx.stroke();
+
+    ctx.fillStyle = "#000";
+    ctx.fillText(d.data.feature, 0, -nodeH/2 - 10);
+    ctx.fillText(`Schwelle: ${d.data.threshold.toFixed(3)}`, 0, nodeH/2 + 14);
 
     // split-line
     const rel = d.data.threshold;
     const tX  = -nodeW/2 + rel*nodeW;
 
-    n.append("line")
-     .attr("x1",tX).attr("x2",tX)
-     .attr("y1",-nodeH/2).attr("y2",nodeH/2)
-     .attr("stroke","black").attr("stroke-width",2);
+    ctx.beginPath();
+    ctx.moveTo(tX, -nodeH/2);
+    ctx.lineTo(tX,  nodeH/2);
+    ctx.strokeStyle = "black";
+    ctx.lineWidth = 2;
+    ctx.stroke();
+
+    ctx.restore();
 });
 
 // -----------------------------
-// SUITABILITY-SKALA
+// SUITABILITY-SKALA (SVG)
 // -----------------------------
 const leaves = root.leaves();
 
-const barY = maxY + 160;
-const barX = minX + 80;
-const barW = (maxX-minX) - 160;
-const barH = 35;
-
 const gradSuit = defs.append("linearGradient")
  .attr("id","gradSuit")
  .attr("x1","0%").attr("x2","100%")
@@ -267,6 +355,7 @@ g.append("text")
 // -----------------------------
 // LEAF → BAR Verbindungen
 // -----------------------------
+ctx.beginPath();
 leaves.forEach(d=>{
     const sx = d.x;
     const sy = d.y + 35;
@@ -274,34 +363,262 @@ leaves.forEach(d=>{
     const tx = barX + d.data.suit * barW;
     const ty = barY;
 
-    g.append("path")
-     .attr("fill","none")
-     .attr("stroke","#aaa")
-     .attr("stroke-width",1.2)
-     .attr("d",`
-        M ${sx},${sy}
-        C ${sx},${(sy+ty)/2}  ${tx},${(sy+ty)/2}  ${tx},${ty}
-     `);
+    // gleiche vertikale Bezierkurve wie bei den Kanten
+    link({source:{x:sx, y:sy}, target:{x:tx, y:ty}});
 });
+ctx.strokeStyle = "#aaa";
+ctx.lineWidth = 1.2;
+ctx.stroke();
 
 </script>
 """
 
-    # JSON einsetzen
-    html = html.replace("TREE_JSON_DATA", tree_json_str)
+_HEAD, _REST = _RAW_TEMPLATE.split("TREE_JSON_DATA", 1)
+_MID1, _REST = _REST.split("PALETTES_JSON_DATA", 1)
+_MID2, _TAIL = _REST.split("MIN_FRAME_PX_DATA", 1)
+
+
+def export_html(tree_json, out_path, min_frame_px=1.0, palettes=None):
+    """
+    min_frame_px: Teilbäume, deren Leaves auf der Skala schmaler als
+    diese Pixelbreite sind, werden eingeklappt (0 = nie).
+    palettes: {"ndvi": [...], ...} aus dem Surrogate-JSON (optional).
+    """
+    out_path = Path(out_path)
 
-    out_path.write_text(html, encoding="utf-8")
+    # JSON als Text für D3
+    tree_json_str = dumps_text(tree_json)
+
+    # Template-Stücke und Daten nacheinander schreiben –
+    # kein replace() über das ganze (evtl. viele MB große) HTML
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(_HEAD)
+        f.write(tree_json_str)
+        f.write(_MID1)
+        f.write(dumps_text(palettes or {}))
+        f.write(_MID2)
+        f.write(repr(float(min_frame_px)))
+        f.write(_TAIL)
     print(f"✓ Surrogate Tree HTML exportiert nach: {out_path}")
 
 
+# ---------------------------------------------------------
+# Statische Variante: Layout + SVG in Python, kein D3/JS
+# ---------------------------------------------------------
+# Gleiche Geometrie und Farben wie im D3-Template oben.
+
+DX, DY = 260, 200
+NODE_W, NODE_H = 260, 70
+PADDING = 200
+
+PALETTES = {
+    "ndvi":  ["#f2f2f2", "#a3c586", "#2f6b3a"],
+    "ndwi":  ["#f7fbff", "#6baed6", "#08519c"],
+    "moran": ["#fee8c8", "#fdbb84", "#e34a33"],
+    "geary": ["#f7f4f9", "#998ec3", "#542788"],
+}
+DEFAULT_PALETTE = ["#eee", "#ccc", "#999"]
+
+VIRIDIS = [
+    "#440154", "#482878", "#3e4989", "#31688e", "#26828e",
+    "#1f9e89", "#35b779", "#6ece58", "#b5de2b", "#fde725",
+]
+
+
+def _palette_key(node, palettes):
+    # "pal" aus global_surrogate_train.py, sonst am Feature-Namen raten
+    if node.get("pal") in palettes:
+        return node["pal"]
+    n = (node.get("feature") or "").lower()
+    for key in PALETTES:
+        if key in n:
+            return key
+    return "default"
+
+
+def _build(node, edge=None):
+    """Hilfsbaum mit Suitability-Spannweite je Teilbaum (wie root.eachAfter)."""
+    if "leaf" in node:
+        s = 1.0 / (1.0 + math.exp(-node["leaf"]))
+        return {"node": node, "edge": edge, "kids": [], "collapsed": False,
+                "suit": s, "smin": s, "smax": s, "ssum": s, "n": 1}
+
+    kids = [_build(node[k], lbl) for k, lbl in (("yes", "Ja"), ("no", "Nein")) if k in node]
+    ssum = sum(k["ssum"] for k in kids)
+    n = sum(k["n"] for k in kids)
+    return {"node": node, "edge": edge, "kids": kids, "collapsed": False,
+            "suit": None,
+            "smin": min(k["smin"] for k in kids),
+            "smax": max(k["smax"] for k in kids),
+            "ssum": ssum, "n": n}
+
+
+def _collapse(w, full_bar_w, min_frame_px, is_root=True):
+    """Teilbäume, die auf der Skala schmaler als min_frame_px sind, einklappen."""
+    if not w["kids"]:
+        return
+    if not is_root and (w["smax"] - w["smin"]) * full_bar_w < min_frame_px:
+        w["kids"] = []
+        w["collapsed"] = True
+        w["suit"] = w["ssum"] / w["n"]
+        return
+    for k in w["kids"]:
+        _collapse(k, full_bar_w, min_frame_px, is_root=False)
+
+
+def _place(w, depth, cursor):
+    """Leaves von links nach rechts im Abstand DX, Eltern mittig über den Kindern."""
+    w["y"] = depth * DY
+    if not w["kids"]:
+        w["x"] = cursor[0]
+        cursor[0] += DX
+        return
+    for k in w["kids"]:
+        _place(k, depth + 1, cursor)
+    w["x"] = (w["kids"][0]["x"] + w["kids"][-1]["x"]) / 2
+
+
+def _link(sx, sy, tx, ty):
+    # entspricht d3.linkVertical()
+    my = (sy + ty) / 2
+    return f"M{sx:.1f},{sy:.1f}C{sx:.1f},{my:.1f} {tx:.1f},{my:.1f} {tx:.1f},{ty:.1f}"
+
+
+def _walk(w, edges, labels, nodes, leaves, palettes):
+    """Sammelt die SVG-Fragmente aller sichtbaren Knoten (Pre-Order)."""
+    x, y = w["x"], w["y"]
+    node = w["node"]
+
+    if w["collapsed"] or not w["kids"]:
+        leaves.append(w)
+        if w["collapsed"]:
+            fill, stroke, text = "#ccc", "#888", f"{w['n']} Blätter"
+        else:
+            fill = VIRIDIS[int(w["suit"] * (len(VIRIDIS) - 1))]
+            stroke, text = "#333", f"suit = {w['suit']:.3f}"
+        nodes.append(
+            f'<g transform="translate({x:.1f},{y:.1f})">'
+            f'<rect x="-70" y="-25" width="140" height="50" rx="10" '
+            f'fill="{fill}" stroke="{stroke}"/>'
+            f'<text y="4">{text}</text></g>'
+        )
+        return
+
+    thr = node.get("threshold", 0.5)
+    t_x = -NODE_W / 2 + thr * NODE_W
+
+    for k in w["kids"]:
+        start = x + (t_x - 6 if k["edge"] == "Ja" else t_x + 6)
+        edges.append(_link(start, y, k["x"], k["y"]))
+        labels.append(
+            f'<text class="edge" x="{(x + k["x"]) / 2:.1f}" '
+            f'y="{(y + k["y"]) / 2 - 6:.1f}">{k["edge"]}</text>'
+        )
+
+    nodes.append(
+        f'<g transform="translate({x:.1f},{y:.1f})">'
+        f'<rect x="{-NODE_W / 2}" y="{-NODE_H / 2}" width="{NODE_W}" height="{NODE_H}" '
+        f'rx="12" fill="url(#pal-{_palette_key(node, palettes)})" stroke="#333"/>'
+        f'<text y="{-NODE_H / 2 - 10}">{escape(str(node.get("feature", "")))}</text>'
+        f'<text y="{NODE_H / 2 + 14}">Schwelle: {thr:.3f}</text>'
+        f'<line x1="{t_x:.1f}" x2="{t_x:.1f}" y1="{-NODE_H / 2}" y2="{NODE_H / 2}" '
+        f'stroke="black" stroke-width="2"/></g>'
+    )
+
+    for k in w["kids"]:
+        _walk(k, edges, labels, nodes, leaves, palettes)
+
+
+def _gradient(gid, colors):
+    stops = "".join(
+        f'<stop offset="{i / (len(colors) - 1) * 100:.1f}%" stop-color="{c}"/>'
+        for i, c in enumerate(colors)
+    )
+    return f'<linearGradient id="{gid}" x1="0%" x2="100%" y1="0%" y2="0%">{stops}</linearGradient>'
+
+
+def export_static_html(tree_json, out_path, min_frame_px=1.0, palettes=None):
+    """
+    Wie export_html, aber Layout und SVG werden hier berechnet –
+    die Seite braucht weder D3 noch JavaScript (kein Zoom).
+    """
+    out_path = Path(out_path)
+    palettes = {**PALETTES, "default": DEFAULT_PALETTE, **(palettes or {})}
+
+    root = _build(tree_json)
+    full_bar_w = max(1, (root["n"] - 1) * DX - 160)
+    if min_frame_px > 0:
+        _collapse(root, full_bar_w, min_frame_px)
+    _place(root, 0, [0.0])
+
+    edges, labels, nodes, leaves = [], [], [], []
+    _walk(root, edges, labels, nodes, leaves, palettes)
+
+    xs = [leaves[0]["x"], leaves[-1]["x"], root["x"]]
+    min_x, max_x = min(xs), max(xs)
+    min_y, max_y = 0, max(l["y"] for l in leaves)
+
+    bar_x, bar_y = min_x + 80, max_y + 160
+    bar_w, bar_h = max(1, (max_x - min_x) - 160), 35
+    width = (max_x - min_x) + 2 * PADDING
+    height = (max_y - min_y) + 3 * PADDING
+
+    leaf_links = [
+        _link(l["x"], l["y"] + 35, bar_x + l["suit"] * bar_w, bar_y)
+        for l in leaves
+    ]
+
+    defs = [_gradient(f"pal-{k}", v) for k, v in palettes.items()]
+    defs.append(_gradient("gradSuit", VIRIDIS))
+
+    parts = [
+        '<!DOCTYPE html>\n<meta charset="utf-8">\n'
+        "<title>Surrogate Tree – ML-Erklärung</title>\n"
+        "<style>\n"
+        "body { font-family: system-ui, sans-serif; margin: 0; padding: 1rem; background: #fafafa; }\n"
+        "text { font-size: 12px; text-anchor: middle; }\n"
+        "text.edge { font-size: 11px; text-anchor: start; fill: #666; }\n"
+        "</style>\n",
+        f'<svg width="{width:.0f}" height="{height:.0f}">',
+        "<defs>", *defs, "</defs>",
+        f'<g transform="translate({PADDING - min_x:.1f},{PADDING - min_y:.1f})">',
+        '<path fill="none" stroke="#777" stroke-width="1.5" d="', *edges, '"/>',
+        *labels,
+        *nodes,
+        f'<rect x="{bar_x:.1f}" y="{bar_y:.1f}" width="{bar_w:.1f}" height="{bar_h}" '
+        'fill="url(#gradSuit)" stroke="#333"/>',
+        f'<text x="{bar_x:.1f}" y="{bar_y - 12:.1f}" style="text-anchor:start">'
+        "Suitability (0 → 1, Viridis)</text>",
+        '<path fill="none" stroke="#aaa" stroke-width="1.2" d="', *leaf_links, '"/>',
+        "</g></svg>\n",
+    ]
+
+    # ein Join, ein Schreibvorgang
+    out_path.write_text("".join(parts), encoding="utf-8")
+    print(f"✓ Surrogate Tree (statisches SVG) exportiert nach: {out_path}")
+
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--json", required=True)
     parser.add_argument("--out", default="surrogate_tree.html")
+    parser.add_argument("--min-frame-px", type=float, default=1.0,
+                        help="Teilbäume schmaler als N Pixel auf der Skala einklappen (0 = aus)")
+    parser.add_argument("--static", action="store_true",
+                        help="fertiges SVG statt D3-Seite schreiben (kein JS, kein Zoom)")
     args = parser.parse_args()
 
-    data = json.loads(Path(args.json).read_text())
-    export_html(data, args.out)
+    data = load_json(args.json)
+
+    # neues Format: {"palettes", "ranges", "tree"}; altes: nackter Baum
+    tree = data.get("tree", data)
+    palettes = data.get("palettes", {})
+
+    if args.static:
+        export_static_html(tree, args.out, min_frame_px=args.min_frame_px, palettes=palettes)
+    else:
+        export_html(tree, args.out, min_frame_px=args.min_frame_px, palettes=palettes)
 
 
 if __name__ == "__main__":
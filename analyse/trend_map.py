@@ -20,10 +20,30 @@ import os
 import numpy as np
 import argparse
 import rasterio
-from rasterio.transform import Affine
-import matplotlib.pyplot as plt
+from contextlib import ExitStack
+from rasterio.windows import Window
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.cm import ScalarMappable
+from matplotlib.colors import Normalize
+from matplotlib.figure import Figure
+from PIL import Image
 from pathlib import Path
-from scipy.stats import linregress
+
+from _mask import mask_threshold, load_block
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except Exception:
+    HAVE_NUMBA = False
+
+try:
+    import zarr
+    import dask.array as da
+    HAVE_ZARR = True
+except Exception:
+    HAVE_ZARR = False
 
 # -------------------------------------------------------------
 # CLI
@@ -39,122 +59,314 @@ p.add_argument("--mode", type=str, default="slope",
                choices=["slope", "cumulative"],
                help="Trendmodus")
 p.add_argument("--out", type=str, default="trend_map.tif")
+p.add_argument("--with-numba", action="store_true",
+               help="Slope-Modus per Numba-Kernel, schreibt zusätzlich "
+                    "Intercept- und R²-Karte")
+p.add_argument("--zarr-cache", type=str, default=None,
+               help="Zarr-Store für den maskierten Jahresstapel (T, H, W); "
+                    "wird beim ersten Lauf gefüllt und danach wiederverwendet, "
+                    "Trend per dask über Kacheln (braucht zarr + dask)")
 args = p.parse_args()
 
-years = list(range(args.start, args.end + 1))
-
-# -------------------------------------------------------------
-# Helper
-# -------------------------------------------------------------
-
-def path_for_year(folder, year):
-    # Finde die Datei automatisch
-    for fn in os.listdir(folder):
-        if fn.startswith(f"suitability_{year}_") and fn.endswith(".tif"):
-            return os.path.join(folder, fn)
-    raise FileNotFoundError(f"Kein TIFF für Jahr {year}")
-
-# -------------------------------------------------------------
-# Datenstruktur vorbereiten
-# -------------------------------------------------------------
-print("📥 Lade alle Jahreskarten…")
-
-stack_vals = []
-stack_mask = []
-
-profile = None
-
-for y in years:
-    tif = path_for_year(args.folder, y)
-    print(f"➡ Lade {tif}")
-
-    with rasterio.open(tif) as src:
-        if profile is None:
-            profile = src.profile.copy()
-            H, W = src.height, src.width
+if args.with_numba and not HAVE_NUMBA:
+    p.error("--with-numba gesetzt, aber numba ist nicht installiert")
+if args.zarr_cache and not HAVE_ZARR:
+    p.error("--zarr-cache gesetzt, aber zarr/dask sind nicht installiert")
 
-        vals = src.read(1).astype("float32")
-        mask = src.read(2).astype("float32")
-
-    # Mask anwenden
-    is_real = mask >= args.threshold
-
-    vals = np.where(is_real, vals, np.nan)
-
-    stack_vals.append(vals)
-    stack_mask.append(is_real)
-
-stack_vals = np.stack(stack_vals)    # Shape: (T, H, W)
-stack_mask = np.stack(stack_mask)    # Shape: (T, H, W)
+years = list(range(args.start, args.end + 1))
 
-T = len(years)
+BLOCK = 256          # Zeilen pro Streifen = Kachelgröße der Ausgabe
+PREVIEW_PX = 2048    # max. Kantenlänge für das PNG-Preview
 
 # -------------------------------------------------------------
-# Trendberechnung
+# Helper
 # -------------------------------------------------------------
-print(f"📈 Berechne Trendkarte ({args.mode})…")
-
-trend = np.full((H, W), np.nan, dtype="float32")
 
-if args.mode == "cumulative":
+def build_year_index(folder):
+    # Ein Verzeichnisdurchlauf für alle Jahre: {Jahr: Pfad}
+    idx = {}
+    with os.scandir(folder) as it:
+        for e in it:
+            if e.name.startswith("suitability_") and e.name.endswith(".tif"):
+                try:
+                    idx.setdefault(int(e.name.split("_")[1]), e.path)
+                except ValueError:
+                    pass
+    return idx
+
+
+def path_for_year(year_index, year):
+    try:
+        return year_index[year]
+    except KeyError:
+        raise FileNotFoundError(f"Kein TIFF für Jahr {year}") from None
+
+
+if HAVE_NUMBA:
+    # fastmath ohne nnan/ninf – die NaN-Prüfung muss erhalten bleiben
+    @njit(parallel=True, cache=True,
+          fastmath={"nsz", "arcp", "contract", "afn", "reassoc"})
+    def _slope_kernel(stack_vals, t, valid_count, out_slope, out_intercept, out_r2):
+        """
+        OLS pro Pixel in einem Durchlauf über T (nur echte Jahre, n >= 3).
+        t: zentrierte Jahre; Intercept bezieht sich auf das mittlere Jahr.
+        valid_count: echte Jahre pro Pixel, vorab vektorisiert gezählt –
+        Pixel mit < 3 werden übersprungen, ohne ihre T Werte zu laden.
+        """
+        T, H, W = stack_vals.shape
+        for i in prange(H):
+            for j in range(W):
+                if valid_count[i, j] < 3:
+                    out_slope[i, j] = np.nan
+                    out_intercept[i, j] = np.nan
+                    out_r2[i, j] = np.nan
+                    continue
+
+                n = 0
+                sx = 0.0
+                sy = 0.0
+                sxx = 0.0
+                sxy = 0.0
+                syy = 0.0
+                for k in range(T):
+                    v = stack_vals[k, i, j]
+                    if np.isnan(v):
+                        continue
+                    x = t[k]
+                    n += 1
+                    sx += x
+                    sy += v
+                    sxx += x * x
+                    sxy += x * v
+                    syy += v * v
+
+                vx = n * sxx - sx * sx
+                vy = n * syy - sy * sy
+                cxy = n * sxy - sx * sy
+                b = cxy / vx
+                out_slope[i, j] = b
+                out_intercept[i, j] = (sy - b * sx) / n
+                out_r2[i, j] = cxy * cxy / (vx * vy) if vy > 0 else np.nan
+
+
+def cumulative_block(stack_vals):
     # Summe aller jährlichen Veränderungen
-    # S(t+1) - S(t), nur dort wo beide Jahre real sind
-    deltas = []
+    # S(t+1) - S(t), nur dort wo beide Jahre real sind.
+    # Laufende Summe + Zähler statt (T-1)-Delta-Stack:
+    # nanmean(deltas) * (T-1) == sum_d / cnt * (T-1)
+    h, w = stack_vals.shape[1:]
+    sum_d = np.zeros((h, w), dtype="float32")
+    cnt = np.zeros((h, w), dtype="int32")
+    delta = np.empty((h, w), dtype="float32")
 
     for i in range(T - 1):
-        a = stack_vals[i]
-        b = stack_vals[i + 1]
-        both_real = np.isfinite(a) & np.isfinite(b)
-        delta = np.where(both_real, b - a, np.nan)
-        deltas.append(delta)
+        np.subtract(stack_vals[i + 1], stack_vals[i], out=delta)
+        both_real = np.isfinite(delta)      # NaN, sobald ein Jahr fehlt
+        np.add(sum_d, delta, out=sum_d, where=both_real)
+        cnt += both_real
+
+    trend = np.full((h, w), np.nan, dtype="float32")
+    np.divide(sum_d, cnt, out=trend, where=cnt > 0)
+    trend *= T - 1
+    return trend
+
+
+def slope_block(stack_vals):
+    # Linear Regression pro Pixel – geschlossene OLS-Form entlang der
+    # Zeitachse, vektorisiert über alle Pixel. Jahre zentriert, damit die
+    # Summen in float32 nicht auslöschen (Steigung bleibt gleich).
+    t = np.asarray(years, dtype="float32")
+    t = (t - t.mean()).reshape(T, 1, 1)
+
+    ok = np.isfinite(stack_vals)            # echte Daten per Pixel & Jahr
+    n = ok.sum(axis=0)
+
+    tx = np.where(ok, t, np.float32(0))
+    ty = np.where(ok, stack_vals, np.float32(0))
+    sx = tx.sum(axis=0)
+    sxx = (tx * tx).sum(axis=0)
+    sy = ty.sum(axis=0)
+    sxy = (tx * ty).sum(axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+
+    # wie bisher: erst ab 3 echten Jahren
+    return np.where(n >= 3, slope, np.nan).astype("float32")
+
+
+# zentrierte Jahre für den Numba-Kernel
+t_num = np.asarray(years, dtype="float64")
+t_num -= t_num.mean()
+
+
+def trend_layers(stack_vals):
+    """
+    (T, h, w) → (K, h, w): Trend, im Numba-Modus zusätzlich
+    Intercept & R² (K = 3), sonst K = 1.
+    """
+    if args.mode == "cumulative":
+        return cumulative_block(stack_vals)[None]
+
+    if args.with_numba:
+        h, w = stack_vals.shape[1:]
+        out = np.empty((3, h, w), dtype="float32")
+        # einmal fusioniert zählen (uint8 reicht für T Jahre)
+        valid_count = np.isfinite(stack_vals).sum(axis=0, dtype=np.uint8)
+        _slope_kernel(stack_vals, t_num, valid_count, out[0], out[1], out[2])
+        return out
+
+    return slope_block(stack_vals)[None]
+
+
+def open_zarr_stack(path, srcs, H, W):
+    """
+    Maskierter Jahresstapel als Zarr, Chunks (1, BLOCK, BLOCK).
+    Passt ein vorhandener Store (Jahre, Threshold, Größe und dieselben
+    Eingabedateien – Pfad, mtime, Größe), wird er direkt genutzt – sonst
+    streifenweise aus den TIFFs neu geschrieben.
+    """
+    inputs = []
+    for src in srcs:
+        st = os.stat(src.name)
+        inputs.append([os.path.abspath(src.name), st.st_mtime_ns, st.st_size])
+
+    key = {"years": years, "threshold": args.threshold, "shape": [T, H, W],
+           "inputs": inputs}
+
+    try:
+        z = zarr.open(path, mode="r")
+        if z.attrs.get("complete") and all(z.attrs.get(k) == v for k, v in key.items()):
+            print(f"📦 Nutze Zarr-Cache {path}")
+            return z
+    except Exception:
+        pass
+
+    print(f"📦 Schreibe Zarr-Cache {path}…")
+    z = zarr.open(path, mode="w", shape=(T, H, W), chunks=(1, BLOCK, BLOCK),
+                  dtype="float32", fill_value=np.nan)
+
+    stack_buf = np.empty((T, BLOCK, W), dtype="float32")
+    mask_dtype = srcs[0].dtypes[1]
+    mask_buf = np.empty((BLOCK, W), dtype=mask_dtype)
+    mask_thr = mask_threshold(mask_dtype, args.threshold)
+
+    for r0 in range(0, H, BLOCK):
+        h = min(BLOCK, H - r0)
+        load_block(srcs, Window(0, r0, W, h), stack_buf[:, :h], mask_buf[:h], mask_thr)
+        z[:, r0:r0 + h, :] = stack_buf[:, :h]
+
+    z.attrs.update(key, complete=True)
+    return z
 
-    deltas = np.stack(deltas)        # (T-1, H, W)
-    trend = np.nanmean(deltas, axis=0) * (T - 1)
-
-else:
-    # Linear Regression pro Pixel
-    t = np.array(years)
-
-    for i in range(H):
-        if i % 200 == 0:
-            print(f"  Zeile {i}/{H}")
-
-        row = stack_vals[:, i, :]       # (T, W)
-        ok = np.isfinite(row)           # echte Daten per Pixel
-
-        for j in range(W):
-            r = row[:, j]
-            valid = ok[:, j]
-
-            if valid.sum() < 3:
-                continue
-
-            slope, intercept, _, _, _ = linregress(t[valid], r[valid])
-            trend[i, j] = slope
 
 # -------------------------------------------------------------
-# Speichern: GeoTIFF
+# Eingaben öffnen (einmal, bleiben für alle Blöcke offen)
 # -------------------------------------------------------------
-out_tif = Path(args.out)
-profile.update(count=1, dtype="float32", compress="deflate")
-
-print(f"💾 Schreibe Trend-TIFF → {out_tif}")
-with rasterio.open(out_tif, "w", **profile) as dst:
-    dst.write(trend, 1)
+T = len(years)
+year_index = build_year_index(args.folder)
+tifs = [path_for_year(year_index, y) for y in years]
+
+with ExitStack() as stack:
+    srcs = []
+    for tif in tifs:
+        print(f"➡ Öffne {tif}")
+        srcs.append(stack.enter_context(rasterio.open(tif)))
+
+    profile = srcs[0].profile.copy()
+    H, W = srcs[0].height, srcs[0].width
+
+    # ---------------------------------------------------------
+    # Ausgaben öffnen
+    # ---------------------------------------------------------
+    out_tif = Path(args.out)
+    # Kacheln für fensterweises Lesen im Viz-Pfad, Predictor 3 (Float)
+    # komprimiert glatte Trendwerte deutlich besser, Kompression parallel
+    profile.update(count=1, dtype="float32", compress="deflate",
+                   predictor=3, zlevel=6,
+                   tiled=True, blockxsize=BLOCK, blockysize=BLOCK,
+                   BIGTIFF="IF_SAFER", num_threads="ALL_CPUS")
+
+    print(f"💾 Schreibe Trend-TIFF → {out_tif}")
+    dst = stack.enter_context(rasterio.open(out_tif, "w", **profile))
+
+    # eine Ausgabe pro Layer von trend_layers()
+    dsts = [dst]
+    if args.mode == "slope" and args.with_numba:
+        for name in ("intercept", "r2"):
+            path = out_tif.with_name(f"{out_tif.stem}_{name}{out_tif.suffix}")
+            print(f"💾 Schreibe {name} → {path}")
+            dsts.append(stack.enter_context(rasterio.open(path, "w", **profile)))
+
+    # ---------------------------------------------------------
+    # Trendberechnung blockweise: ganze Zeilenstreifen (BLOCK Zeilen),
+    # passt zum Kachelraster der Ausgabe und zu gestreiften Eingaben.
+    # Im RAM liegt immer nur T × BLOCK × W statt T × H × W.
+    # ---------------------------------------------------------
+    print(f"📈 Berechne Trendkarte ({args.mode}, {BLOCK}er Streifen)…")
+
+    if args.zarr_cache:
+        # Out-of-core: Zarr-Stapel → dask, pro Kachel (T, BLOCK, BLOCK)
+        # dieselbe Blockfunktion wie im Streaming-Pfad
+        z = open_zarr_stack(args.zarr_cache, srcs, H, W)
+        tiles = da.from_zarr(z).rechunk((T, BLOCK, BLOCK))
+        layers = tiles.map_blocks(trend_layers, dtype="float32",
+                                  chunks=((len(dsts),),) + tiles.chunks[1:])
+        # Numba parallelisiert selbst – nicht zusätzlich aus dask-Threads aufrufen
+        scheduler = "synchronous" if args.with_numba else "threads"
+
+        for r0 in range(0, H, BLOCK):
+            h = min(BLOCK, H - r0)
+            win = Window(0, r0, W, h)
+            out = layers[:, r0:r0 + h].compute(scheduler=scheduler)
+            for band, d in zip(out, dsts):
+                d.write(band.astype("float32", copy=False), 1, window=win)
+
+    else:
+        # Lesepuffer einmal anlegen, für den letzten (kürzeren) Streifen
+        # nur als View verkleinert → keine Allokation pro Jahr/Block
+        stack_buf = np.empty((T, BLOCK, W), dtype="float32")
+        mask_dtype = srcs[0].dtypes[1]
+        mask_buf = np.empty((BLOCK, W), dtype=mask_dtype)
+        mask_thr = mask_threshold(mask_dtype, args.threshold)
+
+        for r0 in range(0, H, BLOCK):
+            h = min(BLOCK, H - r0)
+            win = Window(0, r0, W, h)
+
+            stack_vals = stack_buf[:, :h]
+            load_block(srcs, win, stack_vals, mask_buf[:h], mask_thr)
+
+            for band, d in zip(trend_layers(stack_vals), dsts):
+                d.write(band.astype("float32", copy=False), 1, window=win)
+
+# Vorschau aus der geschriebenen Datei, auf Anzeigegröße reduziert
+with rasterio.open(out_tif) as src:
+    k = max(1, max(H, W) // PREVIEW_PX)
+    trend = src.read(1, out_shape=(-(-H // k), -(-W // k)))
 
 # -------------------------------------------------------------
 # PNG Preview
 # -------------------------------------------------------------
 png_path = out_tif.with_suffix(".png")
 
-plt.figure(figsize=(10, 10))
-plt.imshow(trend, cmap="RdBu_r", vmin=-0.1, vmax=0.1)
-plt.colorbar(label="Trend (neg = decline, pos = increase)")
-plt.title(f"Suitability Trend {args.start}–{args.end} ({args.mode})")
-plt.axis("off")
-plt.tight_layout()
-plt.savefig(png_path, dpi=150)
-plt.close()
+# Direkt: Colormap-LUT → RGBA uint8 → PNG, ohne Figure/Axes.
+# NaN (keine echten Daten) wird über die "bad"-Farbe transparent.
+VMIN, VMAX = -0.1, 0.1
+cmap = matplotlib.colormaps["RdBu_r"]
+norm = np.clip((trend - VMIN) / (VMAX - VMIN), 0, 1)
+Image.fromarray(cmap(norm, bytes=True)).save(png_path, optimize=False)
+
+# Farbskala separat als kleine Legende
+legend_path = out_tif.with_name(f"{out_tif.stem}_legend.png")
+fig = Figure(figsize=(6, 1.2), dpi=150)
+ax = fig.subplots()
+fig.colorbar(ScalarMappable(norm=Normalize(VMIN, VMAX), cmap=cmap),
+             cax=ax, orientation="horizontal",
+             label="Trend (neg = decline, pos = increase)")
+ax.set_title(f"Suitability Trend {args.start}–{args.end} ({args.mode})")
+fig.tight_layout()
+FigureCanvasAgg(fig).print_png(legend_path)
 
 print(f"🖼 PNG gespeichert: {png_path}")
 print("🎉 Fertig.")
\ No newline at end of file
@@ -3,17 +3,20 @@
 # Klare, robuste, ordnerfeste Version
 # ============================================================
 
-from pathlib import Path
-from utils.yaml_loader import load_yaml_config
-from utils.region import normalize_region
-from utils.gee_init import initialize_gee
 import sys
+import copy
+from functools import lru_cache
 from pathlib import Path
 
-# Projektwurzel hinzufügen (Ordner, in dem bootstrap.py selbst liegt)
+# Projektwurzel (Ordner, in dem bootstrap.py selbst liegt) – einmal bestimmen
 PROJECT_ROOT = Path(__file__).resolve().parent
-if str(PROJECT_ROOT) not in sys.path:
-    sys.path.insert(0, str(PROJECT_ROOT))
+_PROJECT_ROOT_STR = str(PROJECT_ROOT)
+if _PROJECT_ROOT_STR not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT_STR)
+
+from utils.yaml_loader import load_yaml_config
+from utils.region import normalize_region
+from utils.gee_init import initialize_gee
 
 # ------------------------------------------------------------
 # Hilfsfunktion: Projektwurzel bestimmen
@@ -23,9 +26,9 @@ def get_project_root():
     bootstrap.py liegt im Projektordner:
         inat_habitat_modeling/
     Daher ist die Projektwurzel einfach das parent-Verzeichnis
-    von dieser Datei.
+    von dieser Datei (beim Import einmal aufgelöst).
     """
-    return Path(__file__).resolve().parent
+    return PROJECT_ROOT
 
 
 # ------------------------------------------------------------
@@ -95,24 +98,47 @@ def apply_species_paths(cfg, verbose=True):
     return cfg
 
 
+def _mtime(path):
+    try:
+        return Path(path).stat().st_mtime_ns
+    except OSError:
+        return None
+
+
 # ------------------------------------------------------------
 # HAUPTFUNKTION: Projekt initialisieren
 # ------------------------------------------------------------
-def init(verbose=True, default_yaml=None, local_yaml=None):
+def init(verbose=True, default_yaml=None, local_yaml=None, reload=False):
+    """
+    Lädt die Konfiguration. Wiederholte Aufrufe im selben Prozess
+    (z. B. mehrere Diagnose-Skripte nacheinander) nutzen den Cache –
+    jeder Aufrufer bekommt eine eigene tiefe Kopie zum Verändern.
+
+    Cache-Schlüssel enthält die mtimes beider YAMLs: geänderte Configs
+    (z. B. im Notebook bearbeitet) werden automatisch neu geladen.
+    reload=True erzwingt das Neuladen inkl. Earth-Engine-Init.
+    """
+    if reload:
+        _init_cached.cache_clear()
+
+    # 1) YAML-Pfade setzen
+    config_dir = get_project_root() / "config"
+    default_yaml = Path(default_yaml or (config_dir / "default.yaml"))
+    local_yaml   = Path(local_yaml   or (config_dir / "local.yaml"))
+
+    return copy.deepcopy(_init_cached(verbose, default_yaml, local_yaml,
+                                      _mtime(default_yaml), _mtime(local_yaml)))
+
+
+@lru_cache(maxsize=8)
+def _init_cached(verbose, default_yaml, local_yaml, default_mtime, local_mtime):
 
     print("=========================================")
     print("🔧 BOOTSTRAP: Lade Konfiguration")
     print("=========================================")
 
-    # 1) Projektwurzel korrekt bestimmen
-    project_root = get_project_root()
-    config_dir = project_root / "config"
-
-    print(f"📁 Projektwurzel: {project_root}")
-
-    # 2) YAML-Pfade setzen
-    default_yaml = default_yaml or (config_dir / "default.yaml")
-    local_yaml   = local_yaml   or (config_dir / "local.yaml")
+    # 2) Projektwurzel
+    print(f"📁 Projektwurzel: {get_project_root()}")
 
     print(f"📄 default.yaml: {default_yaml}")
     print(f"📄 local.yaml:   {local_yaml}")
@@ -0,0 +1,46 @@
+"""
+_plot.py
+
+Gemeinsame Plot-Helfer für die Debug-Skripte.
+
+Figure + FigureCanvasAgg direkt statt pyplot: keine globale
+Figure-Verwaltung, kein Backend-Setup, nichts zu schließen –
+passt für viele PNGs hintereinander bzw. in Worker-Prozessen.
+"""
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+HIST_DIRECT_MAX = 10_000_000   # darüber: np.histogram + bar statt ax.hist
+
+
+def downsample(a, target=1024):
+    """Auf Anzeigegröße ausdünnen – Agg rendert ohnehin nur ~target Pixel."""
+    k = max(1, max(a.shape) // target)
+    return a[::k, ::k]
+
+
+def save_image(arr, title, outpath, figsize=(6, 6), cmap="viridis", dpi=100, **kw):
+    """Raster (ausgedünnt) mit Colorbar und Titel als PNG; kw → imshow (z. B. vmin/vmax)."""
+    fig = Figure(figsize=figsize, dpi=dpi)
+    ax = fig.subplots()
+    im = ax.imshow(downsample(arr), cmap=cmap, **kw)
+    fig.colorbar(im, ax=ax)
+    ax.set_title(title)
+    fig.tight_layout()
+    FigureCanvasAgg(fig).print_png(outpath)
+
+
+def save_hist(values, title, outpath, bins=200, figsize=(10, 4), dpi=100, **kw):
+    """Histogramm als PNG; große Arrays vorab mit np.histogram binnen."""
+    fig = Figure(figsize=figsize, dpi=dpi)
+    ax = fig.subplots()
+    if values.size > HIST_DIRECT_MAX:
+        counts, edges = np.histogram(values, bins=bins)
+        ax.bar(edges[:-1], counts, width=np.diff(edges), align="edge", **kw)
+    else:
+        ax.hist(values, bins=bins, **kw)
+    ax.set_title(title)
+    fig.tight_layout()
+    FigureCanvasAgg(fig).print_png(outpath)
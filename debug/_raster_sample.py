@@ -0,0 +1,112 @@
+"""
+_raster_sample.py
+
+Zufallsstichproben aus großen Rastern, ohne das ganze Raster zu laden.
+
+Statt src.read(1) / src.read(2) über H×W werden zuerst Pixelpositionen
+gezogen und dann nur die GDAL-Blöcke gelesen, in denen Positionen liegen –
+jeder Block genau einmal, immer nur ein Block im Speicher.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+from rasterio.windows import Window
+
+# Stichproben zwischen Läufen (ridgeline / violin / trend), nur Plotparameter ändern sich
+CACHE_DIR = Path("~/.cache/inat_samples").expanduser()
+
+
+def sample_pixels(src, n, bands=(1, 2), rng=None, replace=False):
+    """
+    n zufällige Pixel aus `bands` eines geöffneten Datasets.
+    Rückgabe: (len(bands), n) float32, in (zufälliger) Ziehungsreihenfolge.
+
+    replace=True zieht mit Zurücklegen: nur n Zufallszahlen, keine
+    Duplikat-Buchhaltung. Bei n ≪ H·W (z. B. 20k aus Millionen) sind
+    doppelte Pixel vernachlässigbar – für Statistiken wie im QA reicht das.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    H, W = src.height, src.width
+
+    if replace:
+        flat = rng.integers(0, H * W, size=n)
+    else:
+        n = min(n, H * W)
+        flat = rng.choice(H * W, size=n, replace=False)
+    ys, xs = np.divmod(flat, W)
+
+    # Positionen nach Block gruppieren
+    bh, bw = src.block_shapes[0]
+    n_bx = -(-W // bw)
+    block = (ys // bh) * n_bx + xs // bw
+    order = np.argsort(block, kind="stable")
+    block = block[order]
+    starts = np.flatnonzero(np.r_[True, block[1:] != block[:-1]])
+    ends = np.r_[starts[1:], n]
+
+    out = np.empty((len(bands), n), dtype="float32")
+    for a, b in zip(starts, ends):
+        by, bx = divmod(int(block[a]), n_bx)
+        y0, x0 = by * bh, bx * bw
+        win = Window(x0, y0, min(bw, W - x0), min(bh, H - y0))
+        data = src.read(list(bands), window=win, out_dtype="float32")
+
+        sel = order[a:b]
+        out[:, sel] = data[:, ys[sel] - y0, xs[sel] - x0]
+
+    return out
+
+
+def sample_valid(src, n, valid_fn, bands=(1, 2), rng=None):
+    """
+    Bis zu n Pixel, für die valid_fn(data) gilt (data: (len(bands), m)),
+    gleichverteilt über alle gültigen Pixel – wie Filtern des Vollrasters
+    mit anschließendem Sampling. Reicht der gültige Anteil der ersten
+    Ziehung nicht, wird mit entsprechend mehr Positionen neu gezogen.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    N = src.height * src.width
+    m = min(n, N)
+
+    while True:
+        data = sample_pixels(src, m, bands, rng)
+        ok = valid_fn(data)
+        k = int(ok.sum())
+        if k >= n or m >= N:
+            break
+        frac = max(k, 1) / m
+        m = min(N, int(np.ceil(n / frac * 1.2)))
+
+    # Positionen kommen schon in zufälliger Reihenfolge (choice mischt) →
+    # die ersten n gültigen sind eine gleichverteilte Stichprobe: ein Gather
+    # statt Filtern + zweitem choice() + zweitem Indexieren
+    return data[:, np.flatnonzero(ok)[:n]]
+
+
+def cached_samples(path, params, compute, use_cache=True):
+    """
+    Stichprobe aus dem Datei-Cache (.npz) oder per compute() → {name: array}.
+    Schlüssel: Pfad, mtime + Größe der Quelldatei und `params`
+    (z. B. Stichprobengröße, Schwelle) – ändert sich das Raster, greift
+    der Cache nicht mehr.
+    """
+    if not use_cache:
+        return compute()
+
+    st = os.stat(path)
+    key = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{params!r}"
+    cache_file = CACHE_DIR / f"{hashlib.sha1(key.encode()).hexdigest()}.npz"
+
+    if cache_file.exists():
+        with np.load(cache_file) as z:
+            return {k: z[k] for k in z.files}
+
+    arrays = compute()
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = cache_file.with_suffix(f".{os.getpid()}.tmp.npz")
+    np.savez(tmp, **arrays)
+    os.replace(tmp, cache_file)   # atomar
+    return arrays
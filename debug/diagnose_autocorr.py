@@ -14,10 +14,13 @@ Nutzung:
 
 import sys
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 import numpy as np
 import rasterio
-import matplotlib.pyplot as plt
+
+from _plot import save_hist, save_image
 
 # ------------------------------------------------------------
 # Projektwurzel so bestimmen, dass bootstrap importierbar ist
@@ -43,20 +46,17 @@ def month_matches(fname: str, months):
     return any(fname.endswith(f"_{m}_AUTOCORR.tif") for m in months)
 
 
-def load_tiff(path: Path):
+def load_tiff(path: Path, bands=None):
+    """Liest nur die angegebenen Bänder (1-basiert), direkt als float32."""
     with rasterio.open(path) as ds:
-        data = ds.read()
+        data = ds.read(indexes=bands, out_dtype="float32")
         profile = ds.profile
     return data, profile
 
 
 def plot_hist(values, title, outpath):
-    plt.figure(figsize=(10, 4))
-    plt.hist(values.flatten(), bins=200, alpha=0.8)
-    plt.title(title)
-    plt.tight_layout()
-    plt.savefig(outpath)
-    plt.close()
+    # values ist schon der kompakte 1-D-Puffer → ravel statt flatten (keine Kopie)
+    save_hist(np.ravel(values), title, outpath, bins=200, alpha=0.8)
 
 
 def plot_clip(image, title, outpath):
@@ -64,13 +64,7 @@ def plot_clip(image, title, outpath):
     ch, cw = h // 2, w // 2
     crop = image[ch-1024:ch+1024, cw-1024:cw+1024]
 
-    plt.figure(figsize=(6, 6))
-    plt.imshow(crop, cmap="viridis")
-    plt.colorbar()
-    plt.title(title)
-    plt.tight_layout()
-    plt.savefig(outpath)
-    plt.close()
+    save_image(crop, title, outpath, figsize=(6, 6))
 
 
 # ------------------------------------------------------------
@@ -83,11 +77,11 @@ def diagnose_file(path: Path, out_base: Path):
     out_dir = out_base / fname.replace(".tif", "")
     out_dir.mkdir(exist_ok=True)
 
-    data, profile = load_tiff(path)
     names = ["Moran NDVI", "Geary NDVI", "Moran NDWI", "Geary NDWI"]
+    data, profile = load_tiff(path, bands=[1, 2, 3, 4])
 
     for i in range(4):
-        band = data[i].astype(float)
+        band = data[i]
         clean = band[np.isfinite(band)]
 
         if clean.size == 0:
@@ -116,6 +110,8 @@ def main():
                         help="Monat(e): --month 08 --month 09")
     parser.add_argument("--all", action="store_true",
                         help="Alle Monate diagnostizieren")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Parallele Prozesse (Standard: alle Kerne)")
     args = parser.parse_args()
 
     # --------------------------------------------------------
@@ -159,10 +155,10 @@ def main():
         return
 
     # --------------------------------------------------------
-    # Diagnose für jede Datei
+    # Diagnose für jede Datei – Dateien sind unabhängig → parallel
     # --------------------------------------------------------
-    for fp in tiffs:
-        diagnose_file(fp, diagnostics_dir)
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        list(ex.map(partial(diagnose_file, out_base=diagnostics_dir), tiffs))
 
     print("\n✅ Fertig.")
 
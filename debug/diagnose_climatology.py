@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import numpy as np
 import rasterio
-import matplotlib.pyplot as plt
+
+from _plot import save_image
 
 # ----------------------------------------------------------
 # Logging
@@ -35,6 +37,7 @@ BAND_NAMES = [
     "Geary NDWI",
 ]
 
+
 # ----------------------------------------------------------
 # Diagnose einer einzelnen Datei
 # ----------------------------------------------------------
@@ -60,27 +63,26 @@ def inspect_climatology(path):
             if nodata is not None:
                 arr[arr == nodata] = np.nan
 
-            valid = np.isfinite(arr)
-            frac_valid = valid.mean() * 100
+            # einmal kompaktieren, dann Statistik auf dem 1-D-Puffer
+            # statt vier nan*-Durchläufe über das ganze Raster
+            clean = arr[np.isfinite(arr)]
+            frac_valid = clean.size / arr.size * 100
 
             log.info(f"\n=== {name} (Band {i}) ===")
             log.info("  ✓ gültige Pixel: %.2f%%", frac_valid)
-            log.info("  ▸ min/max: %.3f / %.3f",
-                     np.nanmin(arr), np.nanmax(arr))
-            log.info("  ▸ mean/std: %.3f / %.3f",
-                     np.nanmean(arr), np.nanstd(arr))
+            if clean.size:
+                log.info("  ▸ min/max: %.3f / %.3f",
+                         clean.min(), clean.max())
+                log.info("  ▸ mean/std: %.3f / %.3f",
+                         clean.mean(), clean.std())
+            else:
+                log.info("  ▸ nur NaNs")
 
             # Thumbnail speichern
             out_img = path.with_suffix(f".band{i}.{name.replace(' ', '_')}.png")
 
             try:
-                plt.figure(figsize=(4, 4))
-                plt.imshow(arr, cmap="viridis")
-                plt.title(f"{name}")
-                plt.colorbar()
-                plt.tight_layout()
-                plt.savefig(out_img, dpi=150)
-                plt.close()
+                save_image(arr, name, out_img, figsize=(4, 4), dpi=150)
                 log.info("  🖼️ Thumbnail gespeichert: %s", out_img)
             except Exception as e:
                 log.warning("  ⚠️ Thumbnail-Fehler (%s): %s", name, e)
@@ -88,7 +90,7 @@ def inspect_climatology(path):
 # ----------------------------------------------------------
 # Batch über alle Monatsdateien
 # ----------------------------------------------------------
-def inspect_all(processed_dir="data/processed"):
+def inspect_all(processed_dir="data/processed", workers=None):
     processed = Path(processed_dir)
     files = sorted(processed.glob("CLIMATOLOGY_*_MONTH_*.tif"))
 
@@ -97,8 +99,9 @@ def inspect_all(processed_dir="data/processed"):
         return
 
     log.info("📦 Gefundene Climatology-Dateien: %d", len(files))
-    for f in files:
-        inspect_climatology(f)
+    # Dateien sind unabhängig → parallel
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        list(ex.map(inspect_climatology, map(str, files)))
 
 # ----------------------------------------------------------
 # Main CLI
@@ -113,12 +116,14 @@ if __name__ == "__main__":
                         help="Alle Klimatologien diagnostizieren")
     parser.add_argument("--dir", type=str, default="data/processed",
                         help="Verzeichnis für Batch")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Parallele Prozesse für --all (Standard: alle Kerne)")
 
     args = parser.parse_args()
 
     if args.file:
         inspect_climatology(args.file)
     elif args.all:
-        inspect_all(args.dir)
+        inspect_all(args.dir, workers=args.workers)
     else:
         parser.print_help()
\ No newline at end of file
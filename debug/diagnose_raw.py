@@ -1,8 +1,10 @@
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import rasterio
-import matplotlib.pyplot as plt
+
+from _plot import save_hist, save_image
 
 # -------------------------------------------------------------------
 # CONFIG
@@ -14,8 +16,9 @@ os.makedirs(OUT_DIR, exist_ok=True)
 
 # Erlaubte Namensmuster:
 # NDVI_NDWI_MEAN_YYYY_MM.tif  oder berlin_2023_10_test.tif  etc.
+# Ohne führendes ".*" → search() statt Backtracking über den ganzen Namen
 FILENAME_PATTERN = re.compile(
-    r".*(\d{4})[_\-](\d{2}).*\.(tif|tiff)$",
+    r"(\d{4})[_\-](\d{2})[^/]*\.tiff?$",
     re.IGNORECASE
 )
 
@@ -23,31 +26,14 @@ FILENAME_PATTERN = re.compile(
 # IO Helpers
 # -------------------------------------------------------------------
 
-def load_tiff(path):
-    """Lädt ein TIFF und gibt (numpy array, profile) zurück."""
-    with rasterio.open(path) as ds:
-        data = ds.read()
-        profile = ds.profile
-    return data, profile
-
-
 def plot_valid_mask(mask, title, outpath):
-    plt.figure(figsize=(6, 6))
-    plt.imshow(mask, cmap="viridis")
-    plt.colorbar()
-    plt.title(title)
-    plt.tight_layout()
-    plt.savefig(outpath)
-    plt.close()
+    # Titel (Datei + Band) gehört ins Bild; feste Skala 0–1, damit eine
+    # komplett gültige Maske nicht dunkel erscheint (0 → dunkel, 1 → gelb)
+    save_image(mask.astype(np.uint8), title, outpath, vmin=0, vmax=1)
 
 
 def plot_hist(values, title, outpath):
-    plt.figure(figsize=(10, 4))
-    plt.hist(values, bins=200)
-    plt.title(title)
-    plt.tight_layout()
-    plt.savefig(outpath)
-    plt.close()
+    save_hist(values, title, outpath, bins=200)
 
 
 # -------------------------------------------------------------------
@@ -62,17 +48,13 @@ def diagnose_raw_file(path):
     out_dir = os.path.join(OUT_DIR, fname.replace(".tif", ""))
     os.makedirs(out_dir, exist_ok=True)
 
-    # Datei laden
-    data, profile = load_tiff(path)
-
-    bands = data.shape[0]
-    if bands < 2:
-        print("❌ Nicht genug Bänder (min. 2 nötig: NDVI, NDWI).")
-        return
-
-    # NDVI/NDWI über Bände 0 und 1
-    ndvi = data[0].astype(float)
-    ndwi = data[1].astype(float)
+    # Datei laden – nur NDVI/NDWI (Bänder 1 und 2), direkt als float32
+    with rasterio.open(path) as ds:
+        if ds.count < 2:
+            print("❌ Nicht genug Bänder (min. 2 nötig: NDVI, NDWI).")
+            return
+        ndvi = ds.read(1, out_dtype="float32")
+        ndwi = ds.read(2, out_dtype="float32")
 
     total_pix = ndvi.size
 
@@ -121,20 +103,24 @@ def diagnose_raw_file(path):
 # -------------------------------------------------------------------
 
 def main():
-    all_files = os.listdir(RAW_DIR)
-    tiffs = [f for f in all_files if f.lower().endswith(".tif")]
+    with os.scandir(RAW_DIR) as it:
+        tiffs = [e.name for e in it if e.name.lower().endswith(".tif")]
 
     print(f"📦 Gefundene TIFFs: {len(tiffs)}")
 
+    todo = []
     for fname in sorted(tiffs):
-        full = os.path.join(RAW_DIR, fname)
-
         # prüfen ob Name zu unserem Schema passt
-        if not FILENAME_PATTERN.match(fname):
+        # (Endungsfilter läuft schon vorher, Regex nur noch für die Kandidaten)
+        if not FILENAME_PATTERN.search(fname):
             print(f"⚠️ Überspringe (kein Monatsdatei-Muster): {fname}")
             continue
 
-        diagnose_raw_file(full)
+        todo.append(os.path.join(RAW_DIR, fname))
+
+    # Dateien sind unabhängig → parallel diagnostizieren
+    with ProcessPoolExecutor() as ex:
+        list(ex.map(diagnose_raw_file, todo))
 
 
 if __name__ == "__main__":
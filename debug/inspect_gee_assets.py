@@ -11,9 +11,22 @@
 
 import ee
 import argparse
+import hashlib
 import json
+import os
+import re
 from pathlib import Path
 import sys
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+    HAVE_ORJSON = True
+except Exception:
+    HAVE_ORJSON = False
+
+REPORT_DIR = Path("debug/asset_reports")
+CACHE_DIR = REPORT_DIR / ".cache"
 
 # ----------------------------------------------------------------------
 # Earth Engine Init
@@ -40,10 +53,80 @@ def get_default_region(cfg):
         return None
 
 
+# ----------------------------------------------------------------------
+# JSON → Bytes: orjson (C, kann numpy-Typen) mit stdlib-Fallback
+# ----------------------------------------------------------------------
+def dump_json_bytes(obj, indent=False):
+    if HAVE_ORJSON:
+        opt = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=opt)
+    return json.dumps(obj, indent=2 if indent else None).encode("utf-8")
+
+
+# ----------------------------------------------------------------------
+# Report-Cache: gültig, solange sich das Asset (updateTime), die
+# Region und die Tiefe (deep) nicht ändern
+# ----------------------------------------------------------------------
+def cache_path(asset_id, metadata, region=None, deep=True):
+    region_key = region.serialize() if region is not None else ""
+    key = f"{asset_id}|{metadata.get('updateTime', '')}|{region_key}|{int(deep)}"
+    return CACHE_DIR / f"{hashlib.sha1(key.encode()).hexdigest()}.json"
+
+
+def load_cached_report(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_cached_report(path, report):
+    # Thumbnail-URLs laufen ab → nie cachen, bei jedem Treffer neu erzeugen
+    report = dict(report, thumbnail_url=None)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(dump_json_bytes(report))
+    os.replace(tmp, path)   # atomar – nie halb geschriebene Cache-Dateien
+
+
+# ----------------------------------------------------------------------
+# Thumbnail (URL ist nur begrenzt gültig)
+# ----------------------------------------------------------------------
+def make_thumbnail(img, region):
+    print("\n🖼️ THUMBNAIL...")
+    try:
+        url = img.getThumbURL({
+            "min": -0.2,
+            "max": 0.9,
+            "region": region.toGeoJSONString(),
+            "dimensions": 512
+        })
+        print("Thumbnail URL:", url)
+        return url
+    except Exception as e:
+        print("⚠️ Thumbnail Fehler:", e)
+        return None
+
+
+def default_region(img, region):
+    """Region-Fallback: Asset-Geometrie, falls keine Region übergeben."""
+    if region is not None:
+        return region
+    try:
+        return img.geometry()
+    except Exception:
+        return None
+
+
 # ----------------------------------------------------------------------
 # Einzelnes Asset inspizieren
 # ----------------------------------------------------------------------
-def inspect_single_asset(asset_id, region=None):
+def inspect_single_asset(asset_id, region=None, force=False, deep=True):
+    """
+    deep=False: nur Metadaten + Bänder + Projektionen – ohne reduceRegion
+    und Thumbnail (zwei schwere Server-Jobs pro Asset).
+    """
     print(f"\n🔍 INSPECT: {asset_id}")
 
     try:
@@ -52,11 +135,32 @@ def inspect_single_asset(asset_id, region=None):
         print(f"❌ Fehler: {e}")
         return
 
+    cached = cache_path(asset_id, metadata, region, deep)
+    if not force:
+        report = load_cached_report(cached)
+        if report is not None:
+            print(f"♻️ Unverändert seit letztem Lauf → Report aus Cache ({cached.name})")
+            if deep:
+                img = ee.Image(asset_id)
+                thumb_region = default_region(img, region)
+                if thumb_region:
+                    report["thumbnail_url"] = make_thumbnail(img, thumb_region)
+            return report
+
     print("📄 METADATA:")
     print(json.dumps(metadata, indent=2))
 
     img = ee.Image(asset_id)
-    bands = img.bandNames().getInfo()
+
+    # Bandnamen + Projektionen aller Bänder serverseitig zusammenbauen
+    # und mit EINEM getInfo() holen statt einem Round-Trip pro Band
+    band_names = img.bandNames()
+    proj_dict = ee.Dictionary.fromLists(
+        band_names,
+        band_names.map(lambda b: img.select([ee.String(b)]).projection()),
+    )
+    info = ee.Dictionary({"bands": band_names, "projections": proj_dict}).getInfo()
+    bands = info["bands"]
 
     # Hauptstruktur
     report = {
@@ -71,16 +175,20 @@ def inspect_single_asset(asset_id, region=None):
     # Projektionen
     print("\n🧭 PROJEKTIONEN:")
     for b in bands:
-        proj = img.select(b).projection().getInfo()
+        proj = info["projections"][b]
         report["projections"][b] = proj
         print(f" • {b} → {proj}")
 
+    if not deep:
+        write_cached_report(cached, report)
+        return report
+
     # Region-Fallback
-    if region is None:
-        try:
-            region = img.geometry()
-        except Exception:
-            region = None
+    region = default_region(img, region)
+
+    # Cache nur schreiben, wenn jeder Schritt geklappt hat – sonst bliebe
+    # ein vorübergehender Fehler bis zur nächsten Asset-Änderung hängen
+    complete = True
 
     # Stats (falls region bekannt)
     if region:
@@ -98,69 +206,88 @@ def inspect_single_asset(asset_id, region=None):
             print(json.dumps(stats, indent=2))
         except Exception as e:
             print("⚠️ Keine Stats möglich:", e)
+            complete = False
     else:
         print("⚠️ Keine Region verfügbar → Stats übersprungen.")
 
     # Thumbnail
     if region:
-        print("\n🖼️ THUMBNAIL...")
-        try:
-            url = img.getThumbURL({
-                "min": -0.2,
-                "max": 0.9,
-                "region": region.toGeoJSONString(),
-                "dimensions": 512
-            })
-            report["thumbnail_url"] = url
-            print("Thumbnail URL:", url)
-        except Exception as e:
-            print("⚠️ Thumbnail Fehler:", e)
+        report["thumbnail_url"] = make_thumbnail(img, region)
+        complete = complete and report["thumbnail_url"] is not None
 
+    if complete:
+        write_cached_report(cached, report)
     return report
 
 
 # ----------------------------------------------------------------------
 # Folder inspizieren
 # ----------------------------------------------------------------------
-def inspect_folder(folder, pattern=None, region=None):
+def list_assets(params, page_size=1000):
+    """Alle Seiten von ee.data.listAssets – sonst fehlt alles nach Seite 1."""
+    assets, token = [], None
+    while True:
+        page = dict(params, pageSize=page_size)
+        if token:
+            page["pageToken"] = token
+        listing = ee.data.listAssets(page)
+        assets.extend(listing.get("assets", []))
+        token = listing.get("nextPageToken")
+        if not token:
+            return assets
+
+
+def inspect_folder(folder, pattern=None, region=None, force=False, workers=16,
+                   deep=False):
     print(f"\n📁 LISTE ASSETS: {folder}")
 
+    params = {"parent": folder}
+    if pattern:
+        # Namensfilter serverseitig → nur passende Assets kommen zurück
+        params["filter"] = f'name=~".*{re.escape(pattern)}.*"'
+
     try:
-        listing = ee.data.listAssets({"parent": folder})
+        assets = list_assets(params)
     except Exception as e:
-        print("❌ Fehler beim Listen:", e)
-        sys.exit(1)
-
-    assets = listing.get("assets", [])
+        if "filter" not in params:
+            print("❌ Fehler beim Listen:", e)
+            sys.exit(1)
+        # Filter-Syntax abgelehnt → ungefiltert listen, lokal filtern
+        print("⚠️ Serverseitiger Filter abgelehnt → filtere lokal:", e)
+        params.pop("filter")
+        try:
+            assets = list_assets(params)
+        except Exception as e:
+            print("❌ Fehler beim Listen:", e)
+            sys.exit(1)
 
     print(f"📦 Gefundene Assets: {len(assets)}")
 
-    # Optional filtern
-    selected = []
-    for a in assets:
-        name = a["name"]
-        if (pattern is None) or (pattern in name):
-            selected.append(name)
+    # Substring-Check bleibt als Absicherung (greift nach einem Fallback,
+    # kostet bei serverseitig gefilterter Liste praktisch nichts)
+    selected = [a["name"] for a in assets if not pattern or pattern in a["name"]]
 
     print(f"📌 Selektiert: {len(selected)} Assets")
     for s in selected:
         print("  •", s)
 
-    return {asset: inspect_single_asset(asset, region) for asset in selected}
+    # getInfo()-Aufrufe sind reine Netzwerk-Wartezeit → Threads reichen
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        reports = ex.map(lambda a: inspect_single_asset(a, region, force, deep), selected)
+        return dict(zip(selected, reports))
 
 
 # ----------------------------------------------------------------------
 # Save report
 # ----------------------------------------------------------------------
-def save_report(report, out_dir="debug/asset_reports"):
+def save_report(report, out_dir=REPORT_DIR):
     out = Path(out_dir)
     out.mkdir(parents=True, exist_ok=True)
 
     name = report["asset_id"].replace("/", "_")
     path = out / f"{name}.json"
 
-    with open(path, "w") as f:
-        json.dump(report, f, indent=2)
+    path.write_bytes(dump_json_bytes(report, indent=True))
 
     print(f"💾 Gespeichert: {path}")
 
@@ -175,6 +302,12 @@ if __name__ == "__main__":
     parser.add_argument("--pattern", type=str, help="Filter für Assetnamen")
     parser.add_argument("--use-cfg-region", action="store_true",
                         help="Region aus cfg verwenden")
+    parser.add_argument("--force", action="store_true",
+                        help="Report-Cache ignorieren und alles neu abfragen")
+    parser.add_argument("--workers", type=int, default=16,
+                        help="Parallele EE-Anfragen im Folder-Modus")
+    parser.add_argument("--deep", action="store_true",
+                        help="Folder-Modus: auch Stats + Thumbnail je Asset (langsam)")
     args = parser.parse_args()
 
     # EE start
@@ -192,13 +325,14 @@ if __name__ == "__main__":
             print("⚠️ cfg konnte nicht geladen werden → Region unbekannt.")
 
     if args.asset:
-        report = inspect_single_asset(args.asset, region)
+        report = inspect_single_asset(args.asset, region, args.force, deep=True)
         save_report(report)
 
     elif args.folder:
-        folder_report = inspect_folder(args.folder, args.pattern, region)
-        for rep in folder_report.values():
-            save_report(rep)
+        folder_report = inspect_folder(args.folder, args.pattern, region,
+                                       args.force, args.workers, deep=args.deep)
+        with ThreadPoolExecutor(max_workers=args.workers) as ex:
+            list(ex.map(save_report, folder_report.values()))
 
     else:
         print("❌ Bitte --asset oder --folder angeben.")
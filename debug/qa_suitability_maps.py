@@ -16,9 +16,15 @@ Verkabelt auf:
 import random
 import numpy as np
 import rasterio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-import matplotlib.pyplot as plt
-from scipy.stats import spearmanr
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from scipy.stats import rankdata, spearmanr
+
+from _plot import save_hist
+from _raster_sample import sample_pixels
 
 
 # =========================================================
@@ -28,11 +34,24 @@ OUTPUT_ROOT = Path("/Volumes/Data/iNaturalist/outputs/macrolepiota_procera")
 QA_DIR = OUTPUT_ROOT / "qa"
 QA_DIR.mkdir(parents=True, exist_ok=True)
 
+# GDAL-Optionen je QA-Lauf (jede Datei läuft in eigener Env im Worker):
+# größerer Block-Cache für die Stichproben-Reads, kein Verzeichnis-Scan
+# beim open()
+GDAL_ENV = dict(GDAL_CACHEMAX=512, GDAL_DISABLE_READDIR_ON_OPEN="EMPTY_DIR")
+
+
+# =========================================================
+#  Spearman ohne spearmanr-Overhead (Validierung, p-Wert)
+# =========================================================
+def fast_spearman(x, y):
+    """Spearman-ρ als Pearson-Korrelation der Ränge."""
+    return np.corrcoef(rankdata(x), rankdata(y))[0, 1]
+
 
 # =========================================================
 #  Hilfsfunktion: QA für einzelne Datei
 # =========================================================
-def run_qa(file_path, n_samples=20000):
+def run_qa(file_path, n_samples=20000, pvalue=False):
     file_path = Path(file_path)
     print(f"\n🔍 QA für: {file_path}")
 
@@ -44,59 +63,48 @@ def run_qa(file_path, n_samples=20000):
     out_dir.mkdir(parents=True, exist_ok=True)
 
     with rasterio.open(file_path) as src:
-        suitability = src.read(1)
-        mask = src.read(2)
-
-    H, W = suitability.shape
-    N = H * W
+        H, W = src.height, src.width
+        N = H * W
 
-    print(f"  Rastergröße: {W} × {H}  →  {N:,} Pixel")
+        print(f"  Rastergröße: {W} × {H}  →  {N:,} Pixel")
 
-    # -----------------------------------------------------
-    # Stichprobe ziehen
-    # -----------------------------------------------------
-    if n_samples > N:
-        n_samples = N
-
-    idx = np.random.choice(N, size=n_samples, replace=False)
-
-    suit_flat = suitability.reshape(-1)[idx]
-    mask_flat = mask.reshape(-1)[idx]
+        # -------------------------------------------------
+        # Stichprobe ziehen – nur die Blöcke der gezogenen
+        # Pixel werden gelesen, nie das ganze Raster
+        # -------------------------------------------------
+        # mit Zurücklegen – Kollisionen bei 20k aus Millionen vernachlässigbar
+        suit_flat, mask_flat = sample_pixels(src, n_samples, replace=True)
 
     # -----------------------------------------------------
     # Korrelation
     # -----------------------------------------------------
-    rho, p = spearmanr(mask_flat, suit_flat)
-    print(f"  📈 Spearman r = {rho:.4f}   (p={p:.3g})")
+    # p-Wert nur auf Wunsch – dann volles spearmanr
+    if pvalue:
+        rho, p = spearmanr(mask_flat, suit_flat)
+        print(f"  📈 Spearman r = {rho:.4f}   (p={p:.3g})")
+    else:
+        rho, p = fast_spearman(mask_flat, suit_flat), None
+        print(f"  📈 Spearman r = {rho:.4f}")
 
     # -----------------------------------------------------
     # Speichern: Scatterplot
     # -----------------------------------------------------
-    plt.figure(figsize=(6, 6))
-    plt.scatter(mask_flat, suit_flat, s=3, alpha=0.3)
-    plt.xlabel("Mask (0–1)")
-    plt.ylabel("Suitability (0–1)")
-    plt.title(f"Scatter: {file_path.name}\nr={rho:.3f}")
-    plt.tight_layout()
-    plt.savefig(out_dir / "scatter.png", dpi=150)
-    plt.close()
+    fig = Figure(figsize=(6, 6), dpi=150)
+    ax = fig.subplots()
+    ax.scatter(mask_flat, suit_flat, s=3, alpha=0.3)
+    ax.set_xlabel("Mask (0–1)")
+    ax.set_ylabel("Suitability (0–1)")
+    ax.set_title(f"Scatter: {file_path.name}\nr={rho:.3f}")
+    fig.tight_layout()
+    FigureCanvasAgg(fig).print_png(out_dir / "scatter.png")
 
     # -----------------------------------------------------
     # Speichern: Histogramme
     # -----------------------------------------------------
-    plt.figure(figsize=(8, 4))
-    plt.hist(mask_flat, bins=50, alpha=0.7)
-    plt.title("Distribution of Mask Values")
-    plt.tight_layout()
-    plt.savefig(out_dir / "hist_mask.png", dpi=150)
-    plt.close()
-
-    plt.figure(figsize=(8, 4))
-    plt.hist(suit_flat, bins=50, alpha=0.7)
-    plt.title("Distribution of Suitability Values")
-    plt.tight_layout()
-    plt.savefig(out_dir / "hist_suitability.png", dpi=150)
-    plt.close()
+    save_hist(mask_flat, "Distribution of Mask Values", out_dir / "hist_mask.png",
+              bins=50, figsize=(8, 4), dpi=150, alpha=0.7)
+    save_hist(suit_flat, "Distribution of Suitability Values", out_dir / "hist_suitability.png",
+              bins=50, figsize=(8, 4), dpi=150, alpha=0.7)
 
     print(f"  📁 QA gespeichert in: {out_dir}")
     return rho, p
@@ -105,16 +113,21 @@ def run_qa(file_path, n_samples=20000):
 # =========================================================
 # Batch: Alle Dateien im Ordner
 # =========================================================
-def run_qa_for_all(n_samples=20000):
+def _run_qa_env(file_path, n_samples=20000, pvalue=False):
+    """run_qa in eigener GDAL-Umgebung – Env gilt nur im jeweiligen Prozess."""
+    with rasterio.Env(**GDAL_ENV):
+        return run_qa(file_path, n_samples=n_samples, pvalue=pvalue)
+
+
+def run_qa_for_all(n_samples=20000, workers=None, pvalue=False):
     tifs = sorted(OUTPUT_ROOT.glob("suitability_*.tif"))
     print(f"\n🌍 QA für {len(tifs)} Dateien\n")
 
-    results = []
-    for fp in tifs:
-        r, p = run_qa(fp, n_samples=n_samples)
-        results.append((fp.name, r, p))
+    # Dateien sind unabhängig → parallel (Spearman + Plots CPU-lastig)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        stats = list(ex.map(partial(_run_qa_env, n_samples=n_samples, pvalue=pvalue), tifs))
 
-    return results
+    return [(fp.name, r, p) for fp, (r, p) in zip(tifs, stats)]
 
 
 # =========================================================
@@ -127,10 +140,14 @@ if __name__ == "__main__":
     parser.add_argument("--file", type=str, help="Einzelne Datei prüfen")
     parser.add_argument("--all", action="store_true", help="Alle Dateien prüfen")
     parser.add_argument("--samples", type=int, default=20000, help="Anzahl Stichproben")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Parallele Prozesse für --all (Standard: alle Kerne)")
+    parser.add_argument("--pvalue", action="store_true",
+                        help="Zusätzlich p-Wert berechnen (volles scipy.spearmanr)")
 
     args = parser.parse_args()
 
     if args.file:
-        run_qa(args.file, n_samples=args.samples)
+        _run_qa_env(args.file, n_samples=args.samples, pvalue=args.pvalue)
     else:
-        run_qa_for_all(n_samples=args.samples)
\ No newline at end of file
+        run_qa_for_all(n_samples=args.samples, workers=args.workers, pvalue=args.pvalue)
\ No newline at end of file
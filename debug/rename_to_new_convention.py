@@ -25,19 +25,15 @@ RAW_DIR = Path("/Volumes/Data/iNaturalist/raw") / REGION
 
 print("📂 RAW-DIR:", RAW_DIR)
 
-# Alte Muster, die wir erkennen wollen:
-PATTERNS = [
-    re.compile(r".*?(\d{4})[_-](\d{2}).*?\.tif$"),     # z.B. 2023_09, 2023-09, 2023_09_test
-    re.compile(r"NDVI_NDWI_MEAN_(\d{4})_(\d{2})\.tif$"),  # alte Konvention
-]
+# Alte Muster, die wir erkennen wollen: z.B. 2023_09, 2023-09, 2023_09_test,
+# NDVI_NDWI_MEAN_2023_09 (alte Konvention – deckt das gleiche Muster ab).
+# Ohne führendes ".*?" und ohne ".tif$" – main() übergibt nur *.tif-Namen.
+DATE_RE = re.compile(r"(\d{4})[_-](\d{2})")
 
 def parse_date_from_name(name: str):
     """Extrahiert YYYY, MM aus verschiedenen alten Dateinamen."""
-    for pat in PATTERNS:
-        m = pat.search(name)
-        if m:
-            return m.group(1), m.group(2)
-    return None, None
+    m = DATE_RE.search(name)
+    return (m.group(1), m.group(2)) if m else (None, None)
 
 def main():
     tif_files = list(RAW_DIR.glob("*.tif"))
@@ -13,6 +13,7 @@ import pandas as pd
 import numpy as np
 import xgboost as xgb
 import plotly.express as px
+from joblib import Memory
 from pathlib import Path
 from bootstrap import init as bootstrap_init
 
@@ -34,49 +35,63 @@ print("Model:", model_path)
 print("CSV  :", feature_csv)
 
 # ---------------------------------------------------
-# 2) Modell und Daten laden
+# 2) Modell laden, Daten samplen, SHAP berechnen – gecacht
 # ---------------------------------------------------
-model = xgb.XGBClassifier()
-model.load_model(str(model_path))
-
-df = pd.read_csv(feature_csv)
+# Schlüssel: Pfade + mtimes von Modell und CSV, Stichprobengröße, Seed.
+# Reine Plot-Änderungen (Farben, z-Score, Ausgabe) überspringen damit
+# TreeExplainer komplett; neues Modell / neue CSV → neuer Eintrag.
+memory = Memory(Path("~/.cache/inat_shap").expanduser(), verbose=0)
 
 valid_stats = ["ndvi_mean","ndwi_mean","moran_ndvi","geary_ndvi","moran_ndwi","geary_ndwi"]
-feature_cols = [c for c in df.columns if c.startswith("m") and any(s in c for s in valid_stats)]
 
-# Sampling für Performance
-n = min(4000, len(df))
-X = df[feature_cols].sample(n, random_state=0).reset_index(drop=True)
+
+@memory.cache
+def compute_shap(model_path, feature_csv, model_mtime, csv_mtime, n_max=4000, seed=0):
+    model = xgb.XGBClassifier()
+    model.load_model(str(model_path))
+
+    df = pd.read_csv(feature_csv)
+    feature_cols = [c for c in df.columns if c.startswith("m") and any(s in c for s in valid_stats)]
+
+    # Sampling für Performance
+    n = min(n_max, len(df))
+    X = df[feature_cols].sample(n, random_state=seed).reset_index(drop=True)
+
+    explainer = shap.TreeExplainer(model)
+    return X, explainer.shap_values(X)
+
+
+X, shap_vals = compute_shap(
+    model_path, feature_csv,
+    model_path.stat().st_mtime_ns, feature_csv.stat().st_mtime_ns,
+)
+feature_cols = list(X.columns)
 
 # ---------------------------------------------------
-# 3) SHAP Werte berechnen
+# 3) SHAP-Werte in Long-Format bringen
 # ---------------------------------------------------
-explainer = shap.TreeExplainer(model)
-shap_vals = explainer.shap_values(X)
-
-# In DataFrame bringen
-rows = []
-for i, feat in enumerate(feature_cols):
-    vals = X[feat].values
-    shapv = shap_vals[:, i]
-
-    # Z-Score Normalisierung
-    v_mean = np.nanmean(vals)
-    v_std  = np.nanstd(vals)
-    if v_std < 1e-6:
-        zvals = np.zeros_like(vals)
-    else:
-        zvals = (vals - v_mean) / v_std
-
-    for v, z, s in zip(vals, zvals, shapv):
-        rows.append({
-            "feature": feat,
-            "value": v,
-            "value_z": z,
-            "shap": s
-        })
-
-df_shap = pd.DataFrame(rows)
+# In DataFrame bringen – spaltenweise als (N, F)-Arrays statt N·F Dicts
+V = X.to_numpy(dtype="float64")
+S = np.asarray(shap_vals)
+
+# Z-Score Normalisierung je Feature (konstante Features → 0)
+v_mean = np.nanmean(V, axis=0)
+v_std  = np.nanstd(V, axis=0)
+const = v_std < 1e-6
+Z = (V - v_mean) / np.where(const, 1.0, v_std)
+Z[:, const] = 0.0
+
+# Long-Format: Feature für Feature hintereinander (wie bisher) → transponiert abflachen.
+# y-Achse als kleiner Integer-Index: keine kategoriale Achse im Browser – die Namen
+# kommen einmal über ticktext; im Tooltip per customdata (Categorical, kein String-Array)
+feature_idx = np.repeat(np.arange(len(feature_cols), dtype="uint16"), V.shape[0])
+df_shap = pd.DataFrame({
+    "feature_idx": feature_idx,
+    "feature": pd.Categorical.from_codes(feature_idx, categories=feature_cols),
+    "value":   V.T.ravel(),
+    "value_z": Z.T.ravel(),
+    "shap":    S.T.ravel(),
+})
 
 # ---------------------------------------------------
 # 4) Interaktiver Plotly-Beeswarm mit z-Score Farbskala
@@ -84,14 +99,25 @@ df_shap = pd.DataFrame(rows)
 fig = px.scatter(
     df_shap,
     x="shap",
-    y="feature",
+    y="feature_idx",
     color="value_z",                 # z-Score statt raw value
     color_continuous_scale="Turbo",  # bessere Farbdynamik
     opacity=0.5,
     render_mode="webgl",
+    custom_data=["feature"],
 )
 
-fig.update_traces(marker=dict(size=4))
+# ohne Marker-Rand: deutlich weniger WebGL-Zeichenarbeit
+fig.update_traces(
+    marker=dict(size=4, line_width=0),
+    hovertemplate="%{customdata[0]}<br>SHAP = %{x:.4f}<br>z = %{marker.color:.2f}<extra></extra>",
+)
+
+fig.update_yaxes(
+    tickmode="array",
+    tickvals=list(range(len(feature_cols))),
+    ticktext=feature_cols,
+)
 
 fig.update_layout(
     title="Interaktive SHAP-Landschaft (z-Score normalisiert)",
@@ -10,30 +10,28 @@ import numpy as np
 import rasterio
 import plotly.graph_objects as go
 
+from _raster_sample import cached_samples, sample_valid
+
 
 # -------------------------------------------------------
 # 1) Sampling + Qualitätsfilter
 # -------------------------------------------------------
 
-def load_real_pixels(path, max_samples, real_threshold):
-    """Lädt Band 1 (Suitability) + Band 2 (Mask), filtert echte Pixel."""
-    with rasterio.open(path) as src:
-        suit = src.read(1).astype("float32")
-        mask = src.read(2).astype("float32")
-
-    valid = np.isfinite(suit) & np.isfinite(mask)
-    suit = suit[valid]
-    mask = mask[valid]
-
-    real = mask >= real_threshold
-    suit_real = suit[real]
+def load_real_pixels(path, max_samples, real_threshold, use_cache=True):
+    """
+    Stichprobe echter Pixel aus Band 1 (Suitability) + Band 2 (Mask);
+    gelesen werden nur die Blöcke der gezogenen Positionen.
+    """
+    def is_real(data):
+        suit, mask = data
+        return np.isfinite(suit) & (mask >= real_threshold)   # NaN-Mask → False
 
-    # Sampling
-    if len(suit_real) > max_samples:
-        idx = np.random.choice(len(suit_real), max_samples, replace=False)
-        suit_real = suit_real[idx]
+    def compute():
+        with rasterio.open(path) as src:
+            return {"suit": sample_valid(src, max_samples, is_real)[0]}
 
-    return suit_real
+    return cached_samples(path, ("real", max_samples, real_threshold),
+                          compute, use_cache)["suit"]
 
 
 # -------------------------------------------------------
@@ -116,6 +114,8 @@ def main():
     parser.add_argument("--samples", type=int, default=200000)
     parser.add_argument("--target", type=str, required=True)
     parser.add_argument("--contrast", type=str, required=True)
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Stichproben neu ziehen statt aus ~/.cache/inat_samples")
     parser.add_argument("--out", type=str, default="trend_real_CI.html")
     args = parser.parse_args()
 
@@ -132,7 +132,8 @@ def main():
             cis.append(np.nan)
             continue
 
-        vals = load_real_pixels(path, args.samples, args.real_threshold)
+        vals = load_real_pixels(path, args.samples, args.real_threshold,
+                                use_cache=not args.no_cache)
         print(f"➡ Jahr {year}: {len(vals)} echte Pixel")
 
         mean, ci95 = compute_mean_CI(vals)
@@ -15,28 +15,32 @@ import numpy as np
 import rasterio
 import plotly.graph_objects as go
 
+from _raster_sample import cached_samples, sample_valid
+
 
 # ---------------------------------------------------
 # Daten laden (Suitability + Maske)
 # ---------------------------------------------------
-def load_real_pixels(path, real_threshold=0.95, max_samples=200_000):
-    """Lädt nur echte Pixel entsprechend der Data-Quality-Maske."""
-    with rasterio.open(path) as src:
-        suit = src.read(1).astype("float32")
-        mask = src.read(2).astype("float32")
+def load_real_pixels(path, real_threshold=0.95, max_samples=5_000, use_cache=True):
+    """
+    Lädt eine Stichprobe echter Pixel entsprechend der Data-Quality-Maske;
+    gelesen werden nur die Blöcke der gezogenen Positionen.
 
-    valid = np.isfinite(suit) & np.isfinite(mask)
-    suit = suit[valid]
-    mask = mask[valid]
+    Für den Violin-Plot reichen wenige tausend Punkte: die Dichteschätzung
+    ist weit vorher gesättigt, und Plotly schreibt jeden Punkt ins HTML.
+    """
+    def is_real(data):
+        suit, mask = data
+        return np.isfinite(suit) & (mask >= real_threshold)   # NaN-Mask → False
 
-    real_pixels = suit[mask >= real_threshold]
+    def compute():
+        with rasterio.open(path) as src:
+            return {"suit": sample_valid(src, max_samples, is_real)[0]}
 
-    print(f"➡ {os.path.basename(path)}: {len(real_pixels)} echte Pixel")
+    real_pixels = cached_samples(path, ("real", max_samples, real_threshold),
+                                 compute, use_cache)["suit"]
 
-    # Sampling
-    if len(real_pixels) > max_samples:
-        idx = np.random.choice(len(real_pixels), max_samples, replace=False)
-        real_pixels = real_pixels[idx]
+    print(f"➡ {os.path.basename(path)}: {len(real_pixels)} echte Pixel (Stichprobe)")
 
     return real_pixels
 
@@ -48,18 +52,23 @@ def make_violin_plot(all_years, pixel_values, output_html):
 
     fig = go.Figure()
 
-    # Viridis-Farben pro Jahr
+    # Viridis-Farben pro Jahr – einmal als Zahlen-Tupel (0–1) samplen,
+    # Linien- und Füllfarbe daraus formatieren statt String-Ersetzung
     from plotly.colors import sample_colorscale
-    colors = sample_colorscale("Viridis", np.linspace(0, 1, len(all_years)))
+    rgb = [tuple(round(255 * c) for c in t)
+           for t in sample_colorscale("Viridis", np.linspace(0, 1, len(all_years)),
+                                      colortype="tuple")]
+    colors = [f"rgb({r},{g},{b})" for r, g, b in rgb]
+    fill_colors = [f"rgba({r},{g},{b},0.4)" for r, g, b in rgb]
 
     for i, year in enumerate(all_years):
         vals = pixel_values[i]
         fig.add_trace(go.Violin(
-            x=np.full_like(vals, year, dtype=float),
+            x0=year,                     # eine Position statt N gleicher x-Werte im HTML
             y=vals,
             name=str(year),
             line_color=colors[i],
-            fillcolor=colors[i].replace("rgb", "rgba").replace(")", ",0.4)"),
+            fillcolor=fill_colors[i],
             meanline_visible=True,
             box_visible=True
         ))
@@ -93,9 +102,12 @@ def main():
     parser.add_argument("--end", type=int, required=True)
     parser.add_argument("--real_threshold", type=float, default=0.95,
                         help="Mask-Wert ab dem ein Pixel als echt gilt")
-    parser.add_argument("--samples", type=int, default=200_000)
+    parser.add_argument("--samples", type=int, default=5_000,
+                        help="Pixel pro Jahr im Violin-Plot")
     parser.add_argument("--target", type=str, required=True)
     parser.add_argument("--contrast", type=str, required=True)
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Stichproben neu ziehen statt aus ~/.cache/inat_samples")
     parser.add_argument("--out", type=str, default="violin_real_only.html")
     args = parser.parse_args()
 
@@ -112,7 +124,8 @@ def main():
             continue
 
         vals = load_real_pixels(path, real_threshold=args.real_threshold,
-                                max_samples=args.samples)
+                                max_samples=args.samples,
+                                use_cache=not args.no_cache)
         pixel_values.append(vals)
 
     make_violin_plot(years, pixel_values, args.out)
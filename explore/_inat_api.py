@@ -0,0 +1,147 @@
+"""
+_inat_api.py
+
+Gemeinsame HTTP-Helfer für die iNaturalist-Explore-Skripte.
+
+Eine Session für alle Anfragen: Keep-Alive (kein neuer TCP/TLS-Handshake
+pro Aufruf), gzip, Retries mit Backoff bei 429/5xx und ein Token-Bucket
+für das Rate-Limit (~1 Anfrage/s im Mittel, kurze Bursts erlaubt).
+
+Antworten werden (falls requests-cache installiert ist) in einer
+SQLite-Datei zwischengespeichert: taxon_ids und Zählungen für eine feste
+BBox ändern sich kaum, Wiederholungsläufe brauchen so fast kein Netz.
+"""
+
+import threading
+import time
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import requests_cache
+    HAVE_REQUESTS_CACHE = True
+except Exception:
+    HAVE_REQUESTS_CACHE = False
+
+CACHE_FILE = Path("~/.cache/inat_api").expanduser()   # → inat_api.sqlite
+EXPIRE_AFTER = 86400                                    # 1 Tag
+
+TIMEOUT = 30
+POOL_SIZE = 16   # ≥ Anzahl Threads, die gleichzeitig anfragen
+
+HEADERS = {
+    "User-Agent": "inat-habitat-modeling/1.0",
+    "Accept-Encoding": "gzip",
+}
+
+# iNat-Empfehlung: ~1 Anfrage/s dauerhaft
+RATE = 1.0       # Anfragen pro Sekunde
+BURST = 10       # Anfragen ohne Wartezeit am Stück
+
+_session = None
+
+
+# ----------------------------------------------------------------------
+# Rate-Limit
+# ----------------------------------------------------------------------
+class TokenBucket:
+    """Thread-sicherer Token-Bucket: `rate` Tokens/s, höchstens `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # Token reservieren (Bestand darf negativ werden), gewartet wird
+        # außerhalb des Locks → Threads kommen der Reihe nach dran
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+    def drain(self, seconds=0.0):
+        """Bestand leeren, nächste Anfrage frühestens nach `seconds`."""
+        with self.lock:
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    Holt vor jedem Netzwerk-Request ein Token. Cache-Treffer laufen gar
+    nicht erst durch den Adapter und kosten daher nichts.
+    """
+
+    def __init__(self, bucket, **kwargs):
+        self.bucket = bucket
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self.bucket.acquire()
+        r = super().send(request, **kwargs)
+
+        # Server meldet erschöpftes Kontingent → adaptiv zurückfahren
+        retry_after = r.headers.get("Retry-After")
+        if r.status_code == 429 and retry_after:
+            try:
+                self.bucket.drain(float(retry_after))
+            except ValueError:
+                self.bucket.drain(1.0 / self.bucket.rate)
+        elif r.headers.get("X-RateLimit-Remaining") == "0":
+            self.bucket.drain()
+
+        return r
+
+
+BUCKET = TokenBucket(RATE, BURST)
+
+
+def init_session(cache=True, refresh=False):
+    """
+    Session für alle get()-Aufrufe des Prozesses anlegen.
+    cache: über requests-cache (Schlüssel: URL + sortierte Query-Parameter).
+    refresh=True leert den Cache vorher.
+    """
+    global _session
+
+    if cache and HAVE_REQUESTS_CACHE:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        session = requests_cache.CachedSession(str(CACHE_FILE), backend="sqlite",
+                                               expire_after=EXPIRE_AFTER)
+        if refresh:
+            session.cache.clear()
+            print("♻️ iNat-Cache geleert")
+    else:
+        if cache:
+            print("⚠️ requests-cache nicht installiert → ohne Antwort-Cache")
+        session = requests.Session()
+
+    # raise_on_status=False: nach dem letzten Versuch kommt die Antwort
+    # zurück, die Aufrufer prüfen status_code wie bisher selbst
+    retry = Retry(total=5, backoff_factor=0.5,
+                  status_forcelist=[429, 500, 502, 503, 504],
+                  raise_on_status=False)
+    session.mount("https://", RateLimitedAdapter(BUCKET,
+                                                 pool_connections=POOL_SIZE,
+                                                 pool_maxsize=POOL_SIZE,
+                                                 max_retries=retry))
+    session.headers.update(HEADERS)
+
+    _session = session
+    return session
+
+
+def get(url, params=None):
+    """GET über die gemeinsame Session (wird bei Bedarf angelegt)."""
+    if _session is None:
+        init_session()
+    return _session.get(url, params=params, timeout=TIMEOUT)
@@ -7,9 +7,9 @@ Usage:
 """
 
 import sys
-import requests
 from pathlib import Path
 import argparse
+import orjson
 
 # ---------------------------------------------------------
 # 1. Projektwurzel erkennen & bootstrap importieren
@@ -19,6 +19,7 @@ PROJECT_ROOT = THIS_FILE.parents[1]
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from bootstrap import init as bootstrap_init
+import _inat_api as api
 
 # ---------------------------------------------------------
 # 2. iNaturalist API Endpoints
@@ -38,10 +39,10 @@ def get_taxon_id(scientific_name: str):
         "per_page": 5,
     }
 
-    r = requests.get(TAXON_URL, params=params)
+    r = api.get(TAXON_URL, params)
     r.raise_for_status()
 
-    for t in r.json().get("results", []):
+    for t in orjson.loads(r.content).get("results", []):
         if t["rank"] == "species" and t["name"].lower() == scientific_name.lower():
             return t["id"]
 
@@ -58,9 +59,9 @@ def count_observations_in_bbox(taxon_id: int, bbox: dict):
         **bbox,
     }
 
-    r = requests.get(OBS_URL, params=params)
+    r = api.get(OBS_URL, params)
     r.raise_for_status()
-    return r.json().get("total_results", 0)
+    return orjson.loads(r.content).get("total_results", 0)
 
 
 # ---------------------------------------------------------
@@ -74,8 +75,14 @@ def main():
         required=True,
         help="Scientific name der Art, z.B. 'Amanita muscaria'"
     )
+    parser.add_argument("--no-cache", action="store_true",
+                        help="API-Antworten nicht cachen")
+    parser.add_argument("--refresh", action="store_true",
+                        help="API-Cache vorher leeren")
     args = parser.parse_args()
 
+    api.init_session(cache=not args.no_cache, refresh=args.refresh)
+
     # ---------------------------
     # Bootstrap laden
     # ---------------------------
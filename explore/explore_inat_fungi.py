@@ -14,13 +14,16 @@ Nutzung:
     python explore_inat_fungi.py --plot
     python explore_inat_fungi.py --all --limit 1000
 """
-import numpy as np
 import argparse
-import requests
+import re
+import orjson
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import matplotlib.pyplot as plt
 
+import _inat_api as api
+
 
 # -------------------------------------------------------
 # Pfade
@@ -30,10 +33,38 @@ OUT_DIR = Path("data/inat_explore")
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
+PAGE_WORKERS = 8   # gleichzeitige Seitenabrufe
+
 
 # -------------------------------------------------------
 # Fetch aus iNaturalist
 # -------------------------------------------------------
+# Nur diese Felder werden aus den verschachtelten Beobachtungen gezogen
+# (Spaltenname, Pfad im JSON) – statt json_normalize über alles
+FLAT_KEYS = (
+    ("id",                          ("id",)),
+    ("observed_on",                 ("observed_on",)),
+    ("quality_grade",               ("quality_grade",)),
+    ("location",                    ("location",)),
+    ("taxon.name",                  ("taxon", "name")),
+    ("taxon.rank",                  ("taxon", "rank")),
+    ("taxon.preferred_common_name", ("taxon", "preferred_common_name")),
+    ("taxon.iconic_taxon_name",     ("taxon", "iconic_taxon_name")),
+    ("user.login",                  ("user", "login")),
+)
+
+
+def flatten_obs(obs):
+    """Eine Beobachtung → flaches Dict mit den FLAT_KEYS-Spalten."""
+    row = {}
+    for col, path in FLAT_KEYS:
+        v = obs
+        for k in path:
+            v = v.get(k) if isinstance(v, dict) else None
+        row[col] = v
+    return row
+
+
 def fetch_inat_fungi(limit=500):
     print(f"📥 Lade iNaturalist (Fungi)… (limit={limit})")
 
@@ -45,24 +76,24 @@ def fetch_inat_fungi(limit=500):
         "order_by": "created_at",
     }
 
-    pages = (limit // 200) + 1
-    all_obs = []
+    # Seitenzahl steht vorab fest → alle Seiten parallel anfragen
+    # (Tempo regelt der Token-Bucket in _inat_api)
+    pages = max(1, -(-limit // 200))
 
-    for p in range(1, pages + 1):
+    def fetch_page(p):
         print(f"   → Seite {p}/{pages}")
-        params["page"] = p
-        r = requests.get(url, params=params)
+        r = api.get(url, {**params, "page": p})
         r.raise_for_status()
+        # direkt flach machen
+        return [flatten_obs(obs) for obs in orjson.loads(r.content)["results"]]
 
-        data = r.json()["results"]
-        all_obs.extend(data)
+    # map liefert in Seitenreihenfolge
+    with ThreadPoolExecutor(max_workers=PAGE_WORKERS) as ex:
+        rows = [row for page in ex.map(fetch_page, range(1, pages + 1)) for row in page]
 
-        if len(all_obs) >= limit:
-            break
+    print(f"✔ Beobachtungen geladen: {len(rows)}")
 
-    print(f"✔ Beobachtungen geladen: {len(all_obs)}")
-
-    df = pd.json_normalize(all_obs)
+    df = pd.DataFrame(rows, columns=[col for col, _ in FLAT_KEYS])
     df.to_csv(DATA_DIR / "fungi_raw.csv", index=False)
     print("💾 Gespeichert: data/inat_raw/fungi_raw.csv")
 
@@ -72,7 +103,21 @@ def fetch_inat_fungi(limit=500):
 # -------------------------------------------------------
 # Bereinigen
 # -------------------------------------------------------
-import numpy as np
+# Relevante Spalten (koordinatenfrei!)
+_KEEP_COLS = (
+    "id",
+    "observed_on",
+    "quality_grade",
+    "taxon.name",
+    "taxon.rank",
+    "taxon.preferred_common_name",
+    "taxon.iconic_taxon_name",
+    "user.login",
+)
+
+# [Zusätze] in Trivialnamen
+_BRACKETS = re.compile(r"\[.*?\]")
+
 
 def clean(df):
     """
@@ -82,33 +127,19 @@ def clean(df):
     - extrahiert nur taxonomische Infos
     """
 
-    # Relevante Spalten (koordinatenfrei!)
-    keep = [
-        "id",
-        "observed_on",
-        "quality_grade",
-        "taxon.name",
-        "taxon.rank",
-        "taxon.preferred_common_name",
-        "taxon.iconic_taxon_name",
-        "user.login",
-    ]
-
-    missing = [c for c in keep if c not in df.columns]
+    missing = [c for c in _KEEP_COLS if c not in df.columns]
     if missing:
         print(f"⚠️ Warnung: Fehlende Spalten im API-Result: {set(missing)}")
-        # fehlen → füllen mit NaN
-        for col in missing:
-            df[col] = np.nan
 
-    df = df[keep].copy()
+    # eine Allokation: vorhandene Spalten übernehmen, fehlende → NaN
+    df = df.reindex(columns=list(_KEEP_COLS))
 
     # Aufräumen
     df["taxon.name"] = df["taxon.name"].astype(str).str.strip()
     df["taxon.preferred_common_name"] = (
         df["taxon.preferred_common_name"]
         .astype(str)
-        .str.replace(r"\[.*?\]", "", regex=True)
+        .str.replace(_BRACKETS, "", regex=True)
         .str.strip()
     )
 
@@ -174,9 +205,15 @@ if __name__ == "__main__":
     parser.add_argument("--plot", action="store_true", help="Plots erzeugen")
     parser.add_argument("--all", action="store_true", help="fetch + inspect + plot")
     parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--no-cache", action="store_true",
+                        help="API-Antworten nicht cachen")
+    parser.add_argument("--refresh", action="store_true",
+                        help="API-Cache vorher leeren")
 
     args = parser.parse_args()
 
+    api.init_session(cache=not args.no_cache, refresh=args.refresh)
+
     # Falls nur Inspect/Plot: bestehende Daten laden
     df = None
     clean_df = None
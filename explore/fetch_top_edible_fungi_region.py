@@ -29,11 +29,13 @@ sys.path.insert(0, str(PROJECT_ROOT))
 
 # Jetzt ist der Import sicher!
 from bootstrap import init as bootstrap_init
+import argparse
+import orjson
 import pandas as pd
-import requests
-import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from bootstrap import init as bootstrap_init
+import _inat_api as api
 
 
 # ============================================================
@@ -51,8 +53,16 @@ OUTPUT_TABLE = BASE_OUT / "top_edible_fungi_region.csv"
 # ============================================================
 
 OBS_URL = "https://api.inaturalist.org/v1/observations"
+SPECIES_COUNTS_URL = "https://api.inaturalist.org/v1/observations/species_counts"
 TAXON_URL = "https://api.inaturalist.org/v1/taxa"
 
+# Gleichzeitige Anfragen – reine Netzwerk-Wartezeit, Threads reichen
+WORKERS = 8
+
+# taxon_ids pro species_counts-Anfrage (komma-getrennt in der URL)
+COUNT_BATCH = 100
+SPECIES_PAGE = 500   # Maximum von /observations/species_counts
+
 
 # ============================================================
 # 3. API Helper
@@ -67,30 +77,63 @@ def get_taxon_id(scientific_name: str):
         "per_page": 5,
     }
 
-    r = requests.get(TAXON_URL, params=params)
+    r = api.get(TAXON_URL, params)
     if r.status_code != 200:
         return None
 
-    for t in r.json().get("results", []):
+    for t in orjson.loads(r.content).get("results", []):
         if t["rank"] == "species" and t["name"].lower() == scientific_name.lower():
             return t["id"]
 
     return None
 
 
-def count_observations_in_bbox(taxon_id: int, bbox: dict):
-    """Zähle Beobachtungen im Bounding Box der Region aus der Config."""
-    params = {
-        "taxon_id": taxon_id,
-        **bbox,
-        "per_page": 1,   # Wir nutzen nur total_results
-    }
-
-    r = requests.get(OBS_URL, params=params)
-    if r.status_code != 200:
-        return 0
-
-    return r.json().get("total_results", 0)
+def count_observations_batch(taxon_ids, bbox: dict):
+    """
+    Beobachtungen im Bounding Box für viele Arten auf einmal:
+    /observations/species_counts liefert Zählungen je Taxon für alle
+    taxon_ids einer Anfrage → ceil(N / COUNT_BATCH) statt N Anfragen.
+
+    species_counts zählt je Blatt-Taxon; Unterarten werden über
+    ancestor_ids ihrer Art zugeschlagen. Ein Chunk kann daher mehr als
+    SPECIES_PAGE Ergebnisse haben → Seiten bis total_results abholen.
+    """
+    counts = dict.fromkeys(taxon_ids, 0)
+
+    for i in range(0, len(taxon_ids), COUNT_BATCH):
+        chunk = taxon_ids[i:i + COUNT_BATCH]
+        wanted = set(chunk)
+        page, seen = 1, 0
+
+        while True:
+            params = {
+                "taxon_id": ",".join(map(str, chunk)),
+                **bbox,
+                "per_page": SPECIES_PAGE,
+                "page": page,
+            }
+
+            r = api.get(SPECIES_COUNTS_URL, params)
+            if r.status_code != 200:
+                print(f"⚠️ species_counts HTTP {r.status_code} (Chunk {i // COUNT_BATCH + 1}, "
+                      f"Seite {page}) → Zählungen unvollständig")
+                break
+
+            data = orjson.loads(r.content)
+            results = data.get("results", [])
+            for res in results:
+                taxon = res.get("taxon", {})
+                for tid in (taxon.get("id"), *taxon.get("ancestor_ids", [])[::-1]):
+                    if tid in wanted:
+                        counts[tid] += res.get("count", 0)
+                        break
+
+            seen += len(results)
+            if not results or seen >= data.get("total_results", 0):
+                break
+            page += 1
+
+    return counts
 
 
 # ============================================================
@@ -98,14 +141,24 @@ def count_observations_in_bbox(taxon_id: int, bbox: dict):
 # ============================================================
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-cache", action="store_true",
+                        help="API-Antworten nicht cachen")
+    parser.add_argument("--refresh", action="store_true",
+                        help="API-Cache vorher leeren")
+    args = parser.parse_args()
+
+    api.init_session(cache=not args.no_cache, refresh=args.refresh)
+
     print("=============================================")
     print("🔧 Lade Region aus Bootstrap-Konfiguration…")
     print("=============================================")
 
     cfg = bootstrap_init(verbose=False)
 
-    # Die Region enthält bereits swlng/swlat/nelng/nelat
-    bbox = cfg["region"]["bbox_wgs84"]
+    # bbox_wgs84 = [west, süd, ost, nord] → iNat-Parameter swlng/swlat/nelng/nelat
+    swlng, swlat, nelng, nelat = cfg["region"]["bbox_wgs84"]
+    bbox = {"swlng": swlng, "swlat": swlat, "nelng": nelng, "nelat": nelat}
     region_name = cfg["defaults"]["region"]
 
     print(f"🌍 Region: {region_name}")
@@ -132,31 +185,35 @@ def main():
     # ---------------------------------------------------------
     # Ergebnisse sammeln
     # ---------------------------------------------------------
-    results = []
+    # taxon_ids parallel suchen (die Namenssuche lässt sich nicht bündeln);
+    # map liefert in Eingabereihenfolge → Ausgabe wie bisher
+    # Tempo regelt der Token-Bucket in _inat_api
+    with ThreadPoolExecutor(max_workers=WORKERS) as ex:
+        tids = list(ex.map(get_taxon_id, fungi))
 
-    for name in fungi:
-        print(f"\n🔍 taxon_id suchen: {name}")
-        tid = get_taxon_id(name)
+    # Beobachtungen aller gefundenen Arten gebündelt zählen
+    found = list(dict.fromkeys(tid for tid in tids if tid is not None))
+    print(f"\n📊 Zähle Beobachtungen für {len(found)} Arten in der Region…")
+    counts = count_observations_batch(found, bbox)
+
+    results = []
+    for name, tid in zip(fungi, tids):
+        print(f"\n🔍 {name}")
 
         if tid is None:
             print("   ⚠️ Keine taxon_id gefunden — übersprungen.")
             continue
 
         print(f"   ✔ taxon_id = {tid}")
-        print("   → Beobachtungen in der Region zählen…")
-
-        count = count_observations_in_bbox(tid, bbox)
-        print(f"   ➝ Beobachtungen: {count}")
+        print(f"   ➝ Beobachtungen in der Region: {counts[tid]}")
 
         results.append({
             "region": region_name,
             "scientific_name": name,
             "taxon_id": tid,
-            "observations": count
+            "observations": counts[tid]
         })
 
-        time.sleep(0.3)  # freundlich zur API
-
     # ---------------------------------------------------------
     # Speichern
     # ---------------------------------------------------------
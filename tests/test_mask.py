@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "analyse"))
+from _mask import mask_threshold, load_block  # noqa: E402
+
+
+class FakeSrc:
+    """Minimaler rasterio-Ersatz: read(band, window, out) füllt `out`."""
+
+    def __init__(self, values, mask):
+        self.bands = {1: values, 2: mask}
+
+    def read(self, band, window=None, out=None):
+        out[...] = self.bands[band]
+        return out
+
+
+def test_nan_mask_pixels_are_dropped():
+    values = np.array([[1.0, 2.0, 3.0]], dtype="float32")
+    mask = np.array([[np.nan, 0.5, 0.9]], dtype="float32")
+    out = np.empty((1, 1, 3), dtype="float32")
+    mask_buf = np.empty((1, 3), dtype="float32")
+
+    load_block([FakeSrc(values, mask)], None, out, mask_buf,
+               mask_threshold(mask.dtype, 0.8))
+
+    assert np.isnan(out[0, 0, 0])
+    assert np.isnan(out[0, 0, 1])
+    assert out[0, 0, 2] == 3.0
+
+
+def test_integer_mask_uses_ceil_threshold():
+    values = np.array([[1.0, 2.0]], dtype="float32")
+    mask = np.array([[0, 1]], dtype="uint8")
+    out = np.empty((1, 1, 2), dtype="float32")
+    mask_buf = np.empty((1, 2), dtype="uint8")
+
+    load_block([FakeSrc(values, mask)], None, out, mask_buf,
+               mask_threshold(mask.dtype, 0.8))
+
+    assert np.isnan(out[0, 0, 0])
+    assert out[0, 0, 1] == 2.0
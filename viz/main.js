@@ -24,7 +24,9 @@ window.addEventListener("DOMContentLoaded", async () => {
   // 1️⃣ Daten laden
   // ==================================================
   const res = await fetch("./surrogate_tree.json");
-  const treeData = await res.json();
+  const data = await res.json();
+  // global_surrogate_train.py schreibt {palettes, ranges, tree}
+  const treeData = data.tree ?? data;
 
   // ==================================================
   // 2️⃣ Layout berechnen